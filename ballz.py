@@ -34,6 +34,8 @@ def main():
         # Check for all dependencies
         try:
             import pygame
+            import numpy
+            import openpyxl
         except ModuleNotFoundError:
             # Install dependencies
             print("O Installing dependencies...")
@@ -62,17 +64,21 @@ def main():
 
     if config["enable_git_auto_update"] and (datetime.now().timestamp() - config["last_git_check"]) > 60:
         # If git update enabled and time since last check less than 60 seconds
-        # Fetch and pull git updates
+        # Fetch in the background, the simulation offers to update and restart if there is a new version
         config["last_git_check"] = datetime.now().timestamp()
         config_file.save()
-        if git.update():
-            os.execl(sys.executable, sys.executable, *sys.argv)  # Restart script
+        git.check_in_background()
 
     os.environ['PYGAME_HIDE_SUPPORT_PROMPT'] = "hide"
     # Hide pygame message
 
     import sim
     sim.init()
+    if sim.restart:
+        # U was pressed after the background check found a new version
+        if git.pull():
+            os.execl(sys.executable, sys.executable, *sys.argv)  # Restart script
+        print("\r\033[K\r! Update failed! (Nothing to update)")
 
 
 if __name__ == "__main__":
@@ -4,30 +4,51 @@ The main simulation package
 
 from datetime import datetime
 
-import pygame
-
-import sim.objects
-from . import loop, window, font, constants, mouse, data, static_scene, export, scenarios, scene_objects, objects
+from . import constants, storage, scenarios, scene_objects, objects, integrators, kernels, ensemble, core
 
 scene: scene_objects.Scene
 iteration: int = 0
 running = True
 simulate = False
+restart = False  # Update and restart ballz when the simulation ends (U, once a new version was found)
 VERSION = "a0.2"
 start = datetime.now().timestamp()
 
 
 def init():
     """
-    Initialize the simulation
+    Initialize the simulation, every phase of the start is timed (see sim.timers.startup)
     :return:
     """
-    window.init()
-    font.init()
-    static_scene.init()
-    scenarios.init()
-    print("\r\033[K\rOK Simulation initialized!")
-    loop.screen()
+    from . import timers  # skipcq: PYL-C0415
+    with timers.phase("import"):
+        # The interface modules all need pygame, only load them once a window is actually wanted (see sim.headless)
+        import pygame  # skipcq: PYL-C0415
+        from . import (loop, window, font, mouse, data, static_scene, export, worker,  # skipcq: PYL-C0415, PYL-W0611
+                       checkpoint)
+
+    with timers.phase("window"):
+        window.init()
+    with timers.phase("font"):
+        font.init()
+    with timers.phase("static scene"):
+        static_scene.init()
+    if worker.enabled:
+        with timers.phase("physics process"):
+            worker.start()
+    with timers.phase("scenarios"):
+        scenarios.init()
+    with timers.phase("first frame"):
+        loop.screen(full=True)
+    with timers.phase("icon"):
+        window.icon()
+    print("\r\033[K\rOK Simulation initialized in " + timers.format_duration(sum(timers.startup.values())) + " (" +
+          ", ".join(f"{name} {timers.format_duration(duration)}" for name, duration in timers.startup.items()) + ")")
     loop.start()
     pygame.quit()
+    worker.stop()
+    print("OK Saved timers to " + timers.dump())
+    if export.running():
+        print("O Waiting for the export to finish")
+        export.current.join()
     print("OK Simulation finished!")
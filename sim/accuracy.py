@@ -0,0 +1,104 @@
+"""
+Compares the global error and the wall clock cost of the fixed step integrators at different step sizes, to find the
+largest delta_t that still meets a tolerance.
+Usage: python -m sim.accuracy [-s SCENARIO] [-d SECONDS] [-t DELTA_T ...] [-r REFERENCE_DELTA_T] [--tolerance TOLERANCE]
+"""
+import argparse
+import sys
+from time import perf_counter_ns
+from typing import List, Tuple
+
+import sim
+from sim.integrators import State, create
+from sim.scene_objects import Scene, Coordinate
+
+
+def report(scenario: dict, duration: float, steps: List[float], reference: float, samples: int = 100) -> List[list]:
+    """
+    Measure the global error and the cost of every fixed step integrator at different step sizes
+    :param scenario: The scenario to simulate
+    :param duration: [s] Simulated time
+    :param steps: [s] The step sizes (delta_t) to try
+    :param reference: [s] Step size of the rk4 reference solution
+    :param samples: Number of points in time to compare with the reference
+    :return: Rows of integrator, delta_t, max length error [m], max angle error [rad], evaluations and time [s], where
+        delta_t is the step size actually simulated (a step size is rounded so that it divides the sample interval)
+    """
+    interval = duration / samples
+
+    def simulate(name: str, delta_t: float) -> Tuple[List[State], float, int, float]:
+        """
+        Simulate with one integrator and collect the state at every sample
+        :return: The samples, the effective delta_t [s], the number of evaluations and the wall clock time [s]
+        """
+        steps_per_sample = max(1, round(interval / delta_t))
+        delta_t = interval / steps_per_sample
+        band = sim.scenarios.create_band(Scene(None, Coordinate(0, 0), 0, 0), scenario, Coordinate(0, 0))
+        band.integrator = create({"integrator": name})
+        tick = band.physics_tick
+        result = []
+        start = perf_counter_ns()
+        for _ in range(samples):
+            for _ in range(steps_per_sample):
+                tick(delta_t)
+            result.append((band.length, band.velocity_of_ball, band.angle_theta, band.angular_velocity_theta))
+        took = (perf_counter_ns() - start) / 1e9
+        evaluations = steps_per_sample * samples if band.integrator is None else band.integrator.evaluations
+        return result, delta_t, evaluations, took
+
+    print("O Calculating reference solution", end="")
+    exact, _, _, _ = simulate("rk4", reference)
+    rows = []
+    for name in ("euler", "verlet", "rk4"):
+        for delta_t in steps:
+            print(f"\r\033[K\rO Simulating {name} with delta_t {delta_t}", end="")
+            result, effective, evaluations, took = simulate(name, delta_t)
+            length_error = max(abs(state[0] - correct[0]) for state, correct in zip(result, exact))
+            angle_error = max(abs(state[2] - correct[2]) for state, correct in zip(result, exact))
+            rows.append([name, effective, length_error, angle_error, evaluations, took])
+    print("\r\033[K\rOK Report complete")
+    return rows
+
+
+def main(argv: List[str] = None):
+    """
+    Print a report of error against cost of all fixed step integrators
+    :param argv: Command line arguments, defaults to sys.argv
+    :return:
+    """
+    parser = argparse.ArgumentParser(prog="python -m sim.accuracy",
+                                     description="Compare the global error and cost of the fixed step integrators")
+    parser.add_argument("-s", "--scenario", type=int, help="Scenario to simulate (default: the selected scenario)")
+    parser.add_argument("-d", "--duration", type=float, default=0.02, help="Simulated time [s] (default: 0.02)")
+    parser.add_argument("-t", "--delta-t", type=float, nargs="+", default=[1e-4, 3e-5, 1e-5, 3e-6, 1e-6],
+                        help="Step sizes to try [s]")
+    parser.add_argument("-r", "--reference", type=float, help="Step size of the rk4 reference [s] "
+                                                              "(default: a tenth of the smallest step size)")
+    parser.add_argument("--tolerance", type=float, default=1e-6,
+                        help="Largest acceptable error of length [m] and angle [rad] (default: 1e-6)")
+    args = parser.parse_args(argv)
+
+    scenarios = sim.scenarios.scenarios.json["scenarios"]
+    index = args.scenario if args.scenario is not None else sim.scenarios.selected()
+    if not 0 <= index < len(scenarios):
+        print(f"! Scenario {index} not defined!")
+        sys.exit(1)
+    reference = args.reference if args.reference is not None else min(args.delta_t) / 10
+    rows = report(scenarios[index], args.duration, sorted(args.delta_t, reverse=True), reference)
+
+    print(f"{'integrator':<10} {'delta_t [s]':>12} {'length error [m]':>17} {'angle error [rad]':>18} "
+          f"{'evaluations':>12} {'time [s]':>9}")
+    for name, delta_t, length_error, angle_error, evaluations, took in rows:
+        print(f"{name:<10} {delta_t:>12.3g} {length_error:>17.3e} {angle_error:>18.3e} {evaluations:>12} "
+              f"{took:>9.4f}")
+    for name in ("euler", "verlet", "rk4"):
+        passing = [row for row in rows if row[0] == name and max(row[2], row[3]) <= args.tolerance]
+        if passing:
+            best = max(passing, key=lambda row: row[1])
+            print(f"OK {name}: largest delta_t within {args.tolerance} is {best[1]} ({round(best[5], 4)}s)")
+        else:
+            print(f"! {name}: no delta_t within {args.tolerance}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,308 @@
+"""
+Benchmarks of the hot paths: the tick variants of sim.loop, ElasticBand.physics_tick, advance and log, rendering a
+frame and the excel export. Rendering uses SDL's dummy video driver, so no window is opened.
+Usage: python -m sim.benchmark [-s SCENARIO] [--quick] [-o FILE]
+       python -m sim.benchmark --compare BASELINE RESULT [--threshold FRACTION]
+
+Every benchmark reports the median and minimum time per iteration (ns_per_iter, ns_min), and from a separate run with
+tracemalloc the number of memory blocks still allocated afterwards (allocations) and the peak of traced memory
+(peak_bytes). Results are saved as json, compare mode exits with 1 if a benchmark got slower or needs more memory.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import tracemalloc
+from copy import deepcopy
+from datetime import datetime
+from os import path
+from statistics import median
+from time import perf_counter_ns
+from typing import Callable, Dict, List
+
+import numpy as np
+
+import sim
+from sim import storage
+from sim.scene_objects import Scene, Coordinate
+
+Result = Dict[str, float]
+
+
+def measure(setup: Callable[[], Callable[[], None]], iterations: int, repeat: int = 5) -> Result:
+    """
+    Measure a benchmark
+    :param setup: Prepares a fresh state and returns the function to measure
+    :param iterations: Number of iterations the measured function runs (to calculate the time per iteration)
+    :param repeat: Number of timed runs
+    :return: The result (see module documentation)
+    """
+    times = []
+    for _ in range(repeat):
+        function = setup()
+        start = perf_counter_ns()
+        function()
+        times.append((perf_counter_ns() - start) / iterations)
+
+    function = setup()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    tracemalloc.reset_peak()
+    start_size = tracemalloc.get_traced_memory()[0]
+    function()
+    peak = tracemalloc.get_traced_memory()[1] - start_size
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    allocations = sum(difference.count_diff for difference in after.compare_to(before, "filename"))
+    return {"ns_per_iter": median(times), "ns_min": min(times), "iterations": iterations,
+            "allocations": allocations, "peak_bytes": peak}
+
+
+def _band(scenario: dict, scene: Scene = None) -> sim.objects.ElasticBand:
+    """
+    Set up an empty simulation state (like loading a scenario)
+    :param scenario: The scenario to simulate
+    :param scene: The scene to use, defaults to a scene that is never drawn
+    :return: The band of the scenario
+    """
+    sim.scenarios.configure_storage(scenario)
+    sim.scene = scene or Scene(None, Coordinate(0, 0), 0, 0)
+    sim.data.realtime = storage.column()
+    sim.data.perf_time = storage.column()
+    sim.iteration = 0
+    sim.loop.realtime = 0
+    sim.loop.delta_t = scenario["simulation"]["delta_t"]
+    sim.loop.log_every = scenario["simulation"]["log_every"]
+    return sim.scenarios.create_band(sim.scene, scenario, sim.scene.middle())
+
+
+def ticks(scenario: dict, iterations: int) -> Dict[str, Result]:
+    """
+    Benchmark the four tick variants of sim.loop.generate_tick
+    :param scenario: The scenario to simulate
+    :param iterations: Iterations per run
+    :return: The results
+    """
+    results = {}
+    configured = sim.loop.maxperf, sim.loop.disable_log
+    for maxperf in (False, True):
+        for disable_log in (False, True):
+            sim.loop.maxperf, sim.loop.disable_log = maxperf, disable_log
+
+            def setup():
+                _band(scenario)
+                tick = sim.loop.generate_tick()
+
+                def run():
+                    for _ in range(iterations):
+                        tick()
+                return run
+            results[f"tick (max_perf={maxperf}, disable_log={disable_log})"] = measure(setup, iterations)
+    sim.loop.maxperf, sim.loop.disable_log = configured
+    return results
+
+
+def band(scenario: dict, iterations: int) -> Dict[str, Result]:
+    """
+    Benchmark ElasticBand.physics_tick and ElasticBand.advance with every integrator and ElasticBand.log
+    :param scenario: The scenario to simulate
+    :param iterations: Iterations per run
+    :return: The results
+    """
+    results = {}
+    for integrator in ("euler", "rk4", "verlet", "dopri5"):
+        variant = deepcopy(scenario)
+        variant["simulation"]["integrator"] = integrator
+
+        def setup():
+            elastic_band = _band(variant)
+            tick = elastic_band.physics_tick
+            delta_t = sim.loop.delta_t
+
+            def run():
+                for _ in range(iterations):
+                    tick(delta_t)
+            return run
+        results[f"physics_tick ({integrator})"] = measure(setup, iterations)
+
+        def setup_advance():
+            elastic_band = _band(variant)
+
+            def run():
+                elastic_band.advance(iterations)
+            return run
+        results[f"advance ({integrator})"] = measure(setup_advance, iterations)
+
+    def setup_log():
+        log = _band(scenario).log
+
+        def run():
+            for _ in range(iterations):
+                log()
+            sim.scene.data[0].data["length [m]"]["data"].view()  # Write the last block too
+        return run
+    results["log"] = measure(setup_log, iterations)
+    return results
+
+
+def _fill(elastic_band: sim.objects.ElasticBand, rows: int):
+    """
+    Fill the log with random data
+    :param elastic_band: The band to fill the log of
+    :param rows: Number of rows
+    :return:
+    """
+    generator = np.random.default_rng(0)
+    elastic_band.store.extend(generator.normal(size=(rows, 10)))
+    sim.data.realtime.extend(np.arange(rows) * sim.loop.delta_t)
+    sim.data.perf_time.extend(generator.uniform(500, 1500, rows))
+
+
+def render(scenario: dict, frames: int, histories: List[int]) -> Dict[str, Result]:
+    """
+    Benchmark rendering a frame (sim.loop.screen) with the plots of the band shown and 50 new rows logged per frame
+    :param scenario: The scenario to simulate
+    :param frames: Frames per run
+    :param histories: Numbers of rows logged before the first frame
+    :return: The results
+    """
+    results = {}
+    for history in histories:
+        def setup():
+            elastic_band = _band(scenario, Scene(sim.window.pygame_scene, Coordinate(0, 0), sim.data.corner.x,
+                                                 sim.window.height))
+            sim.data.selected = elastic_band.band_data
+            _fill(elastic_band, history)
+            sim.loop.screen(full=True)
+            log = elastic_band.log
+
+            def run():
+                for _ in range(frames):
+                    for _ in range(50):
+                        log()
+                        sim.data.perf_time.append(1000)
+                    sim.loop.screen()
+            return run
+        results[f"render frame (history {history})"] = measure(setup, frames)
+    sim.data.selected = None
+    return results
+
+
+def excel(scenario: dict, sizes: List[int]) -> Dict[str, Result]:
+    """
+    Benchmark the excel export, the files are written to a temporary directory
+    :param scenario: The scenario to simulate
+    :param sizes: Numbers of rows to export
+    :return: The results (time per row)
+    """
+    results = {}
+    directory = sim.export.directory
+    try:
+        with tempfile.TemporaryDirectory() as sim.export.directory:
+            for size in sizes:
+                def setup():
+                    _fill(_band(scenario), size)
+
+                    def run():
+                        with contextlib.redirect_stdout(io.StringIO()):
+                            sim.export.export_excel()
+                    return run
+                results[f"export_excel ({size} rows)"] = measure(setup, size, repeat=3)
+    finally:
+        sim.export.directory = directory
+    return results
+
+
+def compare(baseline: dict, result: dict, threshold: float) -> bool:
+    """
+    Print the differences between two benchmark results
+    :param baseline: The results to compare against
+    :param result: The new results
+    :param threshold: Fraction a benchmark may get slower or need more memory before it is a regression
+    :return: Whether there are no regressions
+    """
+    passed = True
+    for name, new in result["results"].items():
+        if name not in baseline["results"]:
+            print(f"O {name}: new")
+            continue
+        old = baseline["results"][name]
+        time = new["ns_per_iter"] / old["ns_per_iter"]
+        memory = (new["peak_bytes"] + 1) / (old["peak_bytes"] + 1)
+        line = f"{name}: {round(old['ns_per_iter'], 1)} -> {round(new['ns_per_iter'], 1)} ns/iter " \
+               f"({round((time - 1) * 100, 1):+}%), peak {old['peak_bytes']} -> {new['peak_bytes']} bytes"
+        if time > 1 + threshold or memory > 1 + threshold:
+            print("! " + line + " REGRESSION")
+            passed = False
+        else:
+            print("OK " + line)
+    return passed
+
+
+def main(argv: List[str] = None):
+    """
+    Parse the command line and run the benchmarks or compare results
+    :param argv: Command line arguments, defaults to sys.argv
+    :return:
+    """
+    parser = argparse.ArgumentParser(prog="python -m sim.benchmark",
+                                     description="Benchmark the hot paths or compare two benchmark results")
+    parser.add_argument("-s", "--scenario", type=int, help="Scenario to benchmark (default: the selected scenario)")
+    parser.add_argument("-q", "--quick", action="store_true", help="Run fewer iterations")
+    parser.add_argument("-o", "--output", help="File to save the results to "
+                                               "(default: exports/ballz_benchmark_%%timestamp%%.json)")
+    parser.add_argument("-c", "--compare", nargs=2, metavar=("BASELINE", "RESULT"),
+                        help="Compare two result files instead of running the benchmarks")
+    parser.add_argument("-t", "--threshold", type=float, default=0.1,
+                        help="Slowdown (fraction) that counts as a regression (default: 0.1)")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        with open(args.compare[0], encoding="utf-8") as baseline, open(args.compare[1], encoding="utf-8") as result:
+            passed = compare(json.load(baseline), json.load(result), args.threshold)
+        sys.exit(0 if passed else 1)
+
+    scenarios = sim.scenarios.scenarios.json["scenarios"]
+    index = args.scenario if args.scenario is not None else sim.scenarios.selected()
+    if not 0 <= index < len(scenarios):
+        print(f"! Scenario {index} not defined!")
+        sys.exit(1)
+    scenario = scenarios[index]
+
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ["PYGAME_HIDE_SUPPORT_PROMPT"] = "hide"
+    import pygame  # skipcq: PYL-C0415 - only the rendering benchmarks need pygame
+    from sim import loop, window, font, data, static_scene, export  # skipcq: PYL-C0415, PYL-W0611
+    window.init()
+    font.init()
+    static_scene.init()
+
+    scale = 10 if args.quick else 1
+    results = {}
+    print("O Benchmarking ticks")
+    results.update(ticks(scenario, 200000 // scale))
+    print("O Benchmarking the elastic band")
+    results.update(band(scenario, 200000 // scale))
+    print("O Benchmarking rendering")
+    results.update(render(scenario, 500 // scale, [10000, 1000000 // scale]))
+    print("O Benchmarking the export")
+    results.update(excel(scenario, [1000, 10000] if args.quick else [1000, 10000, 100000]))
+    pygame.quit()
+
+    for name, result in results.items():
+        print(f"{name}: {round(result['ns_per_iter'], 1)} ns/iter, {result['allocations']} allocations, "
+              f"peak {result['peak_bytes']} bytes")
+    file = args.output or path.join("exports", f"ballz_benchmark_{int(round(datetime.now().timestamp()))}.json")
+    with open(file, "w", encoding="utf-8") as output:
+        json.dump({"version": sim.VERSION, "python": platform.python_version(), "machine": platform.machine(),
+                   "date": datetime.now().isoformat(timespec="seconds"), "scenario": index, "quick": args.quick,
+                   "results": results}, output, indent=2)
+    print("OK Saved " + file)
+
+
+if __name__ == "__main__":
+    main()
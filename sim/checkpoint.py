@@ -0,0 +1,212 @@
+"""
+Checkpoints of the simulation state, saved to a compact binary file per scenario
+(checkpoints/ballz_checkpoints_%scenario%.bin).
+
+A checkpoint is written every "checkpoint_every" iterations (simulation block of the scenario, default 1000000,
+0 to disable) and when K is pressed. B rewinds to the last checkpoint before the current iteration, F resumes from the
+latest checkpoint (the one saved last if there are several of an iteration), also one of an earlier session. The
+logged data up to a checkpoint is kept when possible, otherwise the log starts again at the checkpoint.
+
+File format (little endian): the header (magic, format version, crc32 of the scenario) followed by one record per
+checkpoint (see RECORD). Checkpoints of a scenario that has been changed since are discarded.
+"""
+import json
+import os
+import struct
+import zlib
+from bisect import bisect_left, insort
+from os import path
+from typing import List, Tuple
+
+import sim
+
+directory = "checkpoints"
+every = 1000000  # Iterations between two automatic checkpoints, 0 to disable
+
+HEADER = struct.Struct("<4sHI")  # Magic, format version, crc32 of the scenario
+MAGIC = b"BALZ"
+VERSION = 1
+RECORD = struct.Struct("<qqd3q6d")  # Iteration, log start, real time, log offsets (band, real time, cpu time), state
+
+
+class Checkpoint:
+    """
+    The state of the simulation at one iteration
+    """
+    iteration: int
+    log_start: int  # Iteration the log was started at
+    realtime: float
+    offsets: Tuple[int, int, int]  # Rows in the band store, the real time and the cpu time column
+    state: Tuple[float, ...]  # See ElasticBand.state
+
+    def __init__(self, iteration: int, log_start: int, realtime: float, offsets: Tuple[int, int, int],
+                 state: Tuple[float, ...]):
+        """
+        Create a new checkpoint
+        :param iteration: The iteration
+        :param log_start: Iteration the log was started at
+        :param realtime: [s] Real time
+        :param offsets: Rows in the band store, the real time and the cpu time column
+        :param state: State of the band (see ElasticBand.state)
+        """
+        self.iteration = iteration
+        self.log_start = log_start
+        self.realtime = realtime
+        self.offsets = offsets
+        self.state = state
+
+    def pack(self) -> bytes:
+        """
+        Convert the checkpoint into a record
+        :return: The record
+        """
+        return RECORD.pack(self.iteration, self.log_start, self.realtime, *self.offsets, *self.state)
+
+    @staticmethod
+    def unpack(record: tuple) -> "Checkpoint":
+        """
+        Read a checkpoint from a record
+        :param record: The unpacked values of a record
+        :return: The checkpoint
+        """
+        return Checkpoint(record[0], record[1], record[2], record[3:6], record[6:])
+
+    def __lt__(self, other: "Checkpoint") -> bool:
+        return self.iteration < other.iteration
+
+
+checkpoints: List[Checkpoint] = []  # Checkpoints of the current scenario, ordered by iteration
+log_start = 0  # Iteration the current log was started at
+_file: str
+_crc: int
+_band: sim.objects.ElasticBand
+_next = 0  # Iteration of the next automatic checkpoint
+
+
+def load(index: int, scenario: dict, band: sim.objects.ElasticBand):
+    """
+    Read the checkpoints of a scenario that has just been loaded
+    :param index: Index of the scenario
+    :param scenario: The scenario (one entry of the "scenarios" list)
+    :param band: The band of the scenario
+    :return:
+    """
+    global _file, _crc, _band, every, log_start  # skipcq: PYL-W0603 - checkpoints belong to the current scenario
+    _file = path.join(directory, f"ballz_checkpoints_{index}.bin")
+    _crc = zlib.crc32(json.dumps(scenario, sort_keys=True).encode("utf-8"))
+    _band = band
+    every = scenario["simulation"].get("checkpoint_every", 1000000)
+    log_start = 0
+    checkpoints.clear()
+    _schedule()
+    if not path.isfile(_file):
+        return
+    with open(_file, "rb") as file:
+        content = file.read()
+    if len(content) < HEADER.size or HEADER.unpack_from(content) != (MAGIC, VERSION, _crc):
+        print("O Discarding checkpoints of a changed scenario")
+        os.remove(_file)
+        return
+    complete = (len(content) - HEADER.size) // RECORD.size * RECORD.size  # An interrupted write leaves a partial record
+    checkpoints.extend(sorted(Checkpoint.unpack(record)
+                              for record in RECORD.iter_unpack(content[HEADER.size:HEADER.size + complete])))
+    if not checkpoints:
+        print("O No complete checkpoints found")
+        return
+    print(f"OK Found {len(checkpoints)} checkpoints, F to resume from iteration {checkpoints[-1].iteration}")
+
+
+def tick():
+    """
+    Save a checkpoint if it is due
+    :return:
+    """
+    if every and sim.iteration >= _next:
+        save()
+
+
+def save():
+    """
+    Save a checkpoint of the current state
+    :return:
+    """
+    worker = sim.worker.current
+    if worker is not None and sim.simulate:
+        # Pause the physics process, so the log and the state belong to the same iteration
+        worker.simulate(False)
+    position = bisect_left(checkpoints, Checkpoint(sim.iteration, 0, 0, (0, 0, 0), ()))
+    # With a fixed step the simulation is deterministic, a checkpoint of the same iteration does not need to be saved
+    # again. An adaptive integrator starts with new step sizes after a restore, so it may be somewhere else by now
+    adaptive = _band.integrator is not None and _band.integrator.adaptive
+    if adaptive or position == len(checkpoints) or checkpoints[position].iteration != sim.iteration:
+        checkpoint = Checkpoint(sim.iteration, log_start, sim.loop.realtime,
+                                (len(_band.store), len(sim.data.realtime), len(sim.data.perf_time)), _band.state())
+        insort(checkpoints, checkpoint)
+        if not path.isfile(_file):
+            os.makedirs(directory, exist_ok=True)
+            with open(_file, "wb") as file:
+                file.write(HEADER.pack(MAGIC, VERSION, _crc))
+        with open(_file, "ab") as file:
+            file.write(checkpoint.pack())
+    if worker is not None and sim.simulate:
+        worker.simulate(True)
+    _schedule()
+
+
+def rewind():
+    """
+    Go back to the last checkpoint before the current iteration
+    :return:
+    """
+    position = bisect_left(checkpoints, Checkpoint(sim.iteration, 0, 0, (0, 0, 0), ()))
+    if position == 0:
+        print("! No checkpoint to rewind to")
+        return
+    restore(checkpoints[position - 1])
+
+
+def resume():
+    """
+    Continue from the latest checkpoint
+    :return:
+    """
+    if not checkpoints:
+        print("! No checkpoint to resume from")
+        return
+    restore(checkpoints[-1])
+
+
+def restore(checkpoint: Checkpoint):
+    """
+    Continue from a checkpoint. The log is cut back to the checkpoint if it still holds all rows up to it, otherwise
+    it starts again at the checkpoint
+    :param checkpoint: The checkpoint
+    :return:
+    """
+    global log_start  # skipcq: PYL-W0603 - checkpoints belong to the current scenario
+    columns = (_band.store, sim.data.realtime, sim.data.perf_time)
+    keep = checkpoint.log_start == log_start and checkpoint.iteration <= sim.iteration and _band.store.append_only
+    for column, offset in zip(columns, checkpoint.offsets):
+        keep = keep and len(column) >= offset
+    for column, offset in zip(columns, checkpoint.offsets):
+        column.truncate(offset if keep else 0)
+    if not keep:
+        log_start = checkpoint.iteration
+
+    _band.restore(checkpoint.state)
+    sim.iteration = checkpoint.iteration
+    sim.loop.realtime = checkpoint.realtime
+    if sim.worker.current is not None:
+        sim.worker.current.restore(checkpoint.iteration, checkpoint.realtime, checkpoint.state)
+    _schedule()
+    print(f"OK Continuing from iteration {checkpoint.iteration} ({round(checkpoint.realtime, 6)}s)"
+          + ("" if keep else ", the log starts again"))
+
+
+def _schedule():
+    """
+    Calculate the iteration of the next automatic checkpoint
+    :return:
+    """
+    global _next  # skipcq: PYL-W0603 - checkpoints belong to the current scenario
+    _next = (sim.iteration // every + 1) * every if every else 0
@@ -0,0 +1,125 @@
+"""
+The physics of ballz without a window. A Simulation owns one elastic band with its parameters, integrator and log, and
+its own iteration count, so it does not touch any module globals (sim.iteration, sim.loop, sim.data, the settings of
+sim.storage) and never imports pygame. Any number of simulations can run in one process, for example in a notebook:
+
+    from sim.core import Simulation
+    simulation = Simulation(sim.scenarios.scenarios.json["scenarios"][0])
+    simulation.run_for(0.5)
+    simulation.columns()["elastic band - length [m]"]
+
+sim.headless is built on it, the window still simulates through sim.loop.
+"""
+from __future__ import annotations
+
+from typing import Dict, Sequence, Tuple
+
+import numpy as np
+
+import sim
+from sim import storage
+from sim.ensemble import QUANTITIES
+from sim.scene_objects import Scene, Coordinate
+
+
+class Simulation:
+    """
+    One elastic band simulated on its own. Every log_every-th iteration is logged, like in the window
+    """
+    scenario: dict
+    delta_t: float
+    log_every: int
+    log: bool  # Log data
+    iteration: int  # Iterations simulated so far
+    scene: Scene  # Holds the band and its data objects, it is never drawn
+    band: sim.objects.ElasticBand
+    realtime: storage.Column  # Real time [s] of every logged row
+
+    def __init__(self, scenario: dict, log: bool = True, center: Coordinate = None):
+        """
+        Create the band of a scenario, the log is stored as the "log_mode" of the scenario says
+        :param scenario: The scenario (one entry of the "scenarios" list)
+        :param log: Log data
+        :param center: Center of rotation of the band (the logged coordinates depend on it)
+        """
+        self.scenario = scenario
+        self.delta_t = scenario["simulation"]["delta_t"]
+        self.log_every = scenario["simulation"]["log_every"]
+        self.log = log
+        self.iteration = 0
+        self.scene = Scene(None, Coordinate(0, 0), 0, 0)
+        self.band = sim.scenarios.create_band(self.scene, scenario, center or Coordinate(0, 0),
+                                              storage.store(10, scenario["simulation"]))
+        self.realtime = storage.column(scenario["simulation"])
+
+    @property
+    def time(self) -> float:
+        """
+        Simulated time
+        :return: [s] The time
+        """
+        return self.iteration * self.delta_t
+
+    def run(self, iterations: int):
+        """
+        Simulate iterations
+        :param iterations: Number of iterations
+        :return:
+        """
+        advance = self.band.advance
+        if not self.log:
+            advance(iterations)
+            self.iteration += iterations
+            return
+        log = self.band.log
+        append = self.realtime.append
+        delta_t = self.delta_t
+        log_every = self.log_every
+        iteration = self.iteration
+        end = iteration + iterations
+        while iteration < end:
+            # Advance up to and including the next logged iteration
+            steps = min(-(-iteration // log_every) * log_every + 1, end) - iteration
+            advance(steps)
+            iteration += steps
+            if (iteration - 1) % log_every == 0:
+                log()
+                append(iteration * delta_t)
+        self.iteration = iteration
+
+    def run_for(self, duration: float):
+        """
+        Simulate for some time
+        :param duration: [s] Simulated time, rounded to whole iterations
+        :return:
+        """
+        self.run(int(round(duration / self.delta_t)))
+
+    def state(self) -> Dict[str, float]:
+        """
+        Get the current state of the band
+        :return: Current value of every quantity in sim.ensemble.QUANTITIES
+        """
+        return dict(zip(QUANTITIES, self.band.state()))
+
+    def restore(self, iteration: int, state: Tuple[float, float, float, float, float, float]):
+        """
+        Continue from a state, the log is kept as it is
+        :param iteration: Iteration of the state
+        :param state: The state (see ElasticBand.state)
+        :return:
+        """
+        self.band.restore(state)
+        self.iteration = iteration
+
+    def columns(self) -> Dict[str, Sequence[float]]:
+        """
+        Collect all exported channels
+        :return: The channels ("data object - plot") including the real time, as numpy arrays
+        """
+        result: Dict[str, np.ndarray] = {"real time [s]": self.realtime.view()}
+        for data_object in self.scene.data:
+            for plot, info in data_object.data.items():
+                if info["export"]:
+                    result[data_object.name + " - " + plot] = info["data"].view()
+        return result
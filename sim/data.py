@@ -1,42 +1,130 @@
 """Renders data logged in the simulation"""
-from typing import List, Dict, Tuple
+from typing import List, Tuple
 
+import numpy as np
 import pygame
 
 import sim.window
+from sim import storage
 from sim.scene_objects import Coordinate, DataObject
 
 corner: Coordinate
 selected: DataObject = None
 
-perf_time: List[float] = []
-_font_cache: Dict[str, pygame.Surface] = {}
-realtime: List[float] = []
+perf_time: storage.Column = storage.column()
+# Real times in seconds for every iteration
+realtime: storage.Column = storage.column()
+_plots: List["Plot"] = []  # Cached trace of every plot slot
+_drawn: tuple = None  # What the inspector showed when it was drawn (see draw)
 
 
-# Real times in seconds for every iteration
+class Plot:
+    """
+    The trace of a column, drawn onto its own surface (newest sample on the left, one sample per pixel). The surface
+    is kept between frames: new samples scroll it and only the new segment is drawn, the whole trace is only drawn
+    again when the scale changes
+    """
+    surface: pygame.Surface
+    column: storage.Column = None  # Column the trace was drawn from
+    drawn: int = 0  # Number of samples of the column when the trace was drawn
+    scale: float = 0  # Pixels per unit the trace was drawn with
+
+    def __init__(self, size: Tuple[int, int]):
+        """
+        Create a new empty trace
+        :param size: Size of the trace in pixels
+        """
+        self.surface = pygame.Surface(size)
+
+    def update(self, column: storage.Column, dynamic: bool) -> pygame.Surface:
+        """
+        Bring the trace up to date with a column
+        :param column: The column to show
+        :param dynamic: Scale to the visible samples instead of all samples
+        :return: The surface with the trace
+        """
+        data = column.view()
+        width, height = self.surface.get_size()
+        if column is not self.column or len(data) < self.drawn or not column.append_only:
+            # Other data or samples that changed, start over
+            self.column = column
+            self.drawn = 0
+        visible = data[-width:]
+        if not dynamic:
+            delta = column.statistics.peak
+        elif column.append_only:
+            delta = column.window(width).peak
+        else:
+            delta = float(np.abs(visible).max()) if len(visible) else 0
+        if delta == 0:
+            delta = 1
+        # max_delta * scale = height / 2, the negative part of the graph is the lower half
+        scale = (height // 2) / delta
 
-def draw():
+        new = len(data) - self.drawn
+        if self.drawn == 0 or scale != self.scale or new >= width:
+            self.surface.fill((0, 0, 0))
+            pygame.draw.line(self.surface, (41, 41, 41), (0, height // 2), (width, height // 2), width=5)
+            self._trace(visible, scale)
+        elif new > 0:
+            # Move the old trace to the right and draw the new samples (connected to the last one) in the gap
+            self.surface.scroll(new, 0)
+            self.surface.fill((0, 0, 0), (0, 0, new, height))
+            pygame.draw.line(self.surface, (41, 41, 41), (0, height // 2), (new - 1, height // 2), width=5)
+            self._trace(data[-new - 1:], scale)
+        self.drawn = len(data)
+        self.scale = scale
+        return self.surface
+
+    def _trace(self, values: np.ndarray, scale: float):
+        """
+        Draw samples onto the surface, the last sample at x = 0
+        :param values: The samples, oldest first
+        :param scale: Pixels per unit
+        :return:
+        """
+        if len(values) == 0:
+            return
+        height = self.surface.get_height()
+        # y is inverted
+        points = np.column_stack((np.arange(len(values) - 1, -1, -1),
+                                  height - height // 2 - scale * values)).tolist()
+        if len(points) == 1:
+            pygame.draw.line(self.surface, (255, 0, 0), points[0], points[0], width=2)
+        else:
+            pygame.draw.lines(self.surface, (255, 0, 0), False, points, width=2)
+
+
+def draw() -> List[pygame.Rect]:
     """
-    Draw the plots onto the screen
-    :return:
+    Draw the plots onto the screen, if anything changed since the last time
+    :return: The areas of the display that changed
     """
+    global _drawn  # skipcq: PYL-W0603 - the inspector is only drawn again when it changes
+    shown = (None,) if selected is None else (selected, perf_time, _added(perf_time)) + tuple(
+        (info["data"], _added(info["data"])) for info in selected.data.values())
+    if shown == _drawn:
+        return []
+    _drawn = shown
+    area = pygame.Rect(corner.x - 5, 0, sim.window.width - corner.x + 5, sim.window.height)
+    sim.window.pygame_scene.blit(sim.window.background, area, area)
+
     # Draw the basic "box" for data
     if selected is None:
         # No data
         pygame.draw.line(sim.window.pygame_scene, (255, 255, 255), (corner.x, corner.y), (corner.x, sim.window.height),
                          width=10)
-        rendered = sim.font.main_font.render("object inspector", True, (255, 255, 255), (0, 0, 0))
+        rendered = sim.font.render("object inspector", (255, 255, 255), font=sim.font.main_font)
         obj_rect = rendered.get_rect()
         obj_rect.center = (
             corner.x + (sim.window.width - corner.x) // 2, corner.y + (sim.window.height - corner.y) // 2)
         sim.window.pygame_scene.blit(rendered, obj_rect)
-        rendered = sim.font.main_font.render("click to select", True, (255, 255, 255), (0, 0, 0))
+        rendered = sim.font.render("click to select", (255, 255, 255), font=sim.font.main_font)
         rect = rendered.get_rect()
         rect.center = (corner.x + (sim.window.width - corner.x) // 2,
                        corner.y + (sim.window.height - corner.y) // 2 + obj_rect.size[1] * 2)
         sim.window.pygame_scene.blit(rendered, rect)
-        return
+        return [area]
     plots = min(len(selected.data) + 1, 6)  # Max plots to display is 6
     plot_y_size = sim.window.height // plots
     # The number of plots to display, if the number of plots in the selected sceneobjects are more than the window can fit (height / plot y size)
@@ -44,70 +132,32 @@ def draw():
     data_incl_perf = selected.data.copy()
     data_incl_perf["ns per iteration"] = {"scale_current": True, "data": perf_time}
     for plot_name, info in data_incl_perf.items():
-        data = info["data"]
-        if len(data) == 0:
-            value_rendered = _font("no data", (100, 100, 100))
-        else:
-            value_rendered = sim.font.small_font.render(str(round(data[-1], 5)), True, (100, 100, 100), (0, 0, 0))
-        rendered = _font(plot_name, (255, 255, 255))
-        value_rect = value_rendered.get_rect()
+        data = info["data"].view()
+        value = "no data" if len(data) == 0 else str(round(data[-1], 5))
+        rendered = sim.font.render(plot_name, (255, 255, 255))
         rect = rendered.get_rect()
-        # size = (x_size, y_size)
-        # max x - rect x size / 2, current plot * plot y size + rect y size / 2
-        value_rect.center = (sim.window.width - value_rect.size[0] // 2,
-                             (current_plot + 1) * plot_y_size + value_rect.size[1] // 2 - rect.size[1])
-        # current_plot + 1 * plot_y_size = y position of title of plot below
-        # - rect.size[1] = - title size of plot title
+        # Right aligned, above the title of the plot below (current_plot + 1) * plot_y_size - title size
+        value_y = (current_plot + 1) * plot_y_size - rect.size[1]
         rect.center = (sim.window.width - rect.size[0] // 2 - 5, current_plot * plot_y_size + rect.size[1] // 2 + 5)
         # +10 for white line width
-        # data * scale = y pos
-        # delta is the maximum change to 0
-        if "scale_current" in info:
-            hint = _font("dynamic scale", (100, 100, 100))
-            hint_rect = hint.get_rect()
-            hint_rect.center = (sim.scene.width + hint_rect.size[0] // 2 + 10,
-                                (current_plot + 1) * plot_y_size + value_rect.size[1] // 2 - rect.size[1])
-            # same as above (L.58)
-            sim.window.pygame_scene.blit(hint, hint_rect)
-        if len(data) == 0:
-            delta = 1
-        else:
-            if "scale_current" in info:
-                if len(data) < sim.window.width - int(corner.x):
-                    delta = max(abs(min(data)), max(data))
-                else:
-                    delta = max(abs(min(data[-sim.window.width - int(corner.x):-1])),
-                                max(data[-sim.window.width - int(corner.x):-1]))
-            else:
-                delta = max(abs(min(data)), max(data))
-        if delta == 0:
-            delta = 1
-
-        # max_delta * scale = __max_y_pos / 2
-        y_scale = (plot_y_size // 2) / delta
-        # plot_y_scale half because negative part of graph is half the graph!!!!
-        x = corner.x + 10
-        prev = None
         pygame.draw.line(sim.window.pygame_scene, (41, 41, 41),
                          (corner.x, current_plot * plot_y_size + plot_y_size // 2),
                          (sim.window.width, current_plot * plot_y_size + plot_y_size // 2), width=5)
-        for index in range(len(data) - 1, len(data) - sim.window.width - int(corner.x), -1):
-            if index < 0:
-                current = prev
-            else:
-                current = (x, (current_plot + 1) * plot_y_size - (y_scale * data[index]) - plot_y_size // 2)
-                # top of plot size - y value (y is inverted)
-            x = x + 1
-            if prev is None:
-                if current is None:
-                    continue
-                pygame.draw.line(sim.window.pygame_scene, (255, 0, 0), current, current, width=2)
-            else:
-                pygame.draw.line(sim.window.pygame_scene, (255, 0, 0), prev, current, width=2)
-            prev = current
+        size = (sim.window.width - int(corner.x) - 10, plot_y_size)
+        if len(_plots) <= current_plot:
+            _plots.append(Plot(size))
+        elif _plots[current_plot].surface.get_size() != size:
+            _plots[current_plot] = Plot(size)
+        trace = _plots[current_plot].update(info["data"], "scale_current" in info)
+        sim.window.pygame_scene.blit(trace, (corner.x + 10, current_plot * plot_y_size))
 
+        if "scale_current" in info:
+            hint = sim.font.render("dynamic scale", (100, 100, 100))
+            hint_rect = hint.get_rect()
+            hint_rect.topleft = (sim.scene.width + 10, value_y)  # same height as the value
+            sim.window.pygame_scene.blit(hint, hint_rect)
         sim.window.pygame_scene.blit(rendered, rect)
-        sim.window.pygame_scene.blit(value_rendered, value_rect)
+        sim.font.blit(sim.window.pygame_scene, value, (100, 100, 100), topright=(sim.window.width, value_y))
         pygame.draw.line(sim.window.pygame_scene, (255, 255, 255), (corner.x, (current_plot + 1) * plot_y_size),
                          (sim.window.width, (current_plot + 1) * plot_y_size), width=5)
         # Dont need big white line at the top so current_plot + 1
@@ -122,16 +172,24 @@ def draw():
 
     pygame.draw.line(sim.window.pygame_scene, (255, 255, 255), (corner.x, corner.y), (corner.x, sim.window.height),
                      width=10)
+    return [area]
+
+
+def _added(column: storage.Column) -> int:
+    """
+    Count the samples ever added to a column. Unlike the length it also changes when a min/max store merges points
+    :param column: The column
+    :return: Number of samples
+    """
+    column.view()  # Write buffered rows, they are not in the statistics yet
+    return column.statistics.count
 
 
-def _font(text: str, color: Tuple[int, int, int]) -> pygame.Surface:
+def invalidate():
     """
-    Generate the rendered font or return a cached one
-    :param text: The text to render
-    :param color: The color of the text
-    :return: The rendered font
+    Draw the inspector again the next time, even if nothing changed
+    :return:
     """
-    if text in _font_cache:
-        return _font_cache[text]
-        # Dont even check if it has the correct color. It has.
-    return sim.font.small_font.render(text, True, color, (0, 0, 0))
+    global _drawn  # skipcq: PYL-W0603 - the inspector is only drawn again when it changes
+    _drawn = None
+
@@ -0,0 +1,171 @@
+"""
+Simulates many elastic bands at once using numpy arrays (one array per quantity, one entry per band)
+"""
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+import sim
+from sim.scene_objects import Scene, Coordinate
+
+# State arrays recorded by Ensemble.simulate
+QUANTITIES = ("length", "velocity", "acceleration", "theta", "angular_velocity", "angular_acceleration")
+
+# Exported channels of an ElasticBand ("data object - plot") and the quantity holding their values
+CHANNELS = {
+    "elastic band - length [m]": "length",
+    "elastic band - ball velocity [m/s]": "velocity",
+    "elastic band - ball acceleration [m/s²]": "acceleration",
+    "ball 1 - angle [rad]": "theta",
+    "ball 1 - angular velocity [rad/s]": "angular_velocity",
+    "ball 1 - angular acceleration [rad/s²]": "angular_acceleration",
+    "ball 2 - angle [rad]": "theta",
+    "ball 2 - angular velocity [rad/s]": "angular_velocity",
+    "ball 2 - angular acceleration [rad/s²]": "angular_acceleration",
+}
+
+
+class Ensemble:
+    """
+    A set of independent elastic bands that are all advanced with one vectorized update per step.
+    Every step uses the same operations in the same order as ElasticBand.physics_tick, so each band ends up
+    with exactly the same values as if it were simulated on its own.
+    """
+    size: int
+
+    # Dynamic state
+    length: np.ndarray
+    velocity: np.ndarray
+    acceleration: np.ndarray
+    theta: np.ndarray
+    angular_velocity: np.ndarray
+    angular_acceleration: np.ndarray
+
+    # Per band constants
+    normal_length: np.ndarray
+    friction_coefficient: np.ndarray
+    ball_mass: np.ndarray
+    ball_radius: np.ndarray
+    ball_moment_of_inertia: np.ndarray
+
+    # Constant factors of the equations of motion, precomputed exactly like the scalar tick computes them
+    _spring_term: np.ndarray  # - 1.42 * spring constant
+    _friction_term: np.ndarray  # 2 * mass * g
+    _torsion_term: np.ndarray  # -2 * torsion constant
+    _roll_term: np.ndarray  # roll friction constant * mass * g
+
+    def __init__(self, bands: List[sim.objects.ElasticBand]):
+        """
+        Create an ensemble from the current state of a list of elastic bands
+        :param bands: The bands to copy state and constants from
+        """
+        if any(band.integrator is not None for band in bands):
+            raise ValueError("The ensemble engine only supports the euler integrator")
+        self.size = len(bands)
+
+        def column(values) -> np.ndarray:
+            """Collect one value per band into an array"""
+            return np.array(list(values), dtype=np.float64)
+
+        self.length = column(band.length for band in bands)
+        self.velocity = column(band.velocity_of_ball for band in bands)
+        self.acceleration = column(band.acceleration_of_ball for band in bands)
+        self.theta = column(band.angle_theta for band in bands)
+        self.angular_velocity = column(band.angular_velocity_theta for band in bands)
+        self.angular_acceleration = column(band.angular_acceleration_theta for band in bands)
+
+        self.normal_length = column(band.normal_length for band in bands)
+        self.friction_coefficient = column(band.friction_coefficient for band in bands)
+        self.ball_mass = column(band.ball_mass for band in bands)
+        self.ball_radius = column(band.ball_radius for band in bands)
+        self.ball_moment_of_inertia = column(band.ball_moment_of_inertia for band in bands)
+
+        self._spring_term = column(- 1.42 * band.spring_constant for band in bands)
+        self._friction_term = column(2 * band.ball_mass * sim.constants.g for band in bands)
+        self._torsion_term = column(-2 * band.ball_torsion_constant for band in bands)
+        self._roll_term = column(band.ball_roll_friction_constant * band.ball_mass * sim.constants.g for band in bands)
+
+        # Scratch buffers, so a step does not allocate any arrays
+        self._first = np.empty(self.size)
+        self._second = np.empty(self.size)
+
+    @classmethod
+    def from_scenarios(cls, scenarios: List[dict]) -> "Ensemble":
+        """
+        Create an ensemble with one band per scenario
+        :param scenarios: The scenarios (entries of the "scenarios" list)
+        :return: The new ensemble
+        """
+        scene = Scene(None, Coordinate(0, 0), 0, 0)
+        return cls([sim.scenarios.create_band(scene, scenario, Coordinate(0, 0)) for scenario in scenarios])
+
+    def physics_tick(self, delta_t: float):
+        """
+        Simulate one tick for all bands
+        :param delta_t: delta time used
+        :return:
+        """
+        first, second = self._first, self._second
+
+        np.subtract(self.length, self.normal_length, out=first)
+        np.maximum(first, 0.0, out=first)  # delta_l
+        np.multiply(self._spring_term, first, out=first)
+        np.copysign(1.0, self.velocity, out=second)
+        np.multiply(self.friction_coefficient, second, out=second)
+        np.multiply(self._friction_term, second, out=second)  # friction
+        np.subtract(first, second, out=first)
+        np.multiply(self.angular_velocity, self.angular_velocity, out=second)
+        np.multiply(second, self.ball_mass, out=second)
+        np.multiply(second, self.length, out=second)  # centrifugal force
+        np.add(first, second, out=first)
+        np.divide(first, self.ball_mass, out=self.acceleration)
+
+        np.multiply(delta_t, self.acceleration, out=first)
+        np.add(self.velocity, first, out=self.velocity)
+        np.multiply(delta_t, self.velocity, out=first)
+        np.add(self.length, first, out=self.length)
+
+        np.multiply(self.theta, self.length, out=first)
+        np.divide(first, self.ball_radius, out=first)
+        np.multiply(self._torsion_term, first, out=first)
+        np.subtract(first, self._roll_term, out=first)
+        np.multiply(self.length, self.length, out=second)
+        np.multiply(self.ball_mass, second, out=second)
+        np.add(self.ball_moment_of_inertia, second, out=second)
+        np.multiply(2, second, out=second)
+        np.divide(first, second, out=self.angular_acceleration)
+
+        np.multiply(self.angular_acceleration, delta_t, out=first)
+        np.add(self.angular_velocity, first, out=self.angular_velocity)
+        np.multiply(self.angular_velocity, delta_t, out=first)
+        np.add(self.theta, first, out=self.theta)
+
+    def simulate(self, delta_t: float, iterations: int, log_every: int = 1) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+        """
+        Simulate a number of iterations and record every log_every-th state
+        :param delta_t: delta time used
+        :param iterations: Number of iterations to simulate
+        :param log_every: Record the state after every log_every-th iteration (like ElasticBand.log in the main loop)
+        :return: The real time [s] of every record and a (records x bands) array for every quantity in QUANTITIES
+        """
+        records = (iterations + log_every - 1) // log_every
+        realtime = (np.arange(records) * log_every + 1) * delta_t
+        history = {name: np.empty((records, self.size)) for name in QUANTITIES}
+        targets = [(history[name], getattr(self, name)) for name in QUANTITIES]
+        record = 0
+        tick = self.physics_tick
+        for iteration in range(iterations):
+            tick(delta_t)
+            if iteration % log_every == 0:
+                for target, source in targets:
+                    target[record] = source
+                record += 1
+        return realtime, history
+
+    def state(self, index: int) -> Dict[str, float]:
+        """
+        Get the current state of a single band
+        :param index: Index of the band
+        :return: Current value of every quantity in QUANTITIES
+        """
+        return {name: float(getattr(self, name)[index]) for name in QUANTITIES}
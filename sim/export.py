@@ -2,103 +2,187 @@
 Exports data logged into excel format
 """
 from datetime import datetime
-
-from openpyxl import Workbook, worksheet, utils
+from os import path
+from threading import Event, Thread
+from typing import List, Sequence, TYPE_CHECKING
 
 import sim.data
 
+if TYPE_CHECKING:
+    from openpyxl import worksheet
+
+batch_size = 4096  # Rows converted and written at once
+directory = "exports"  # Directory to save exports to
+current: "Export" = None  # The export that is running in the background
+
+
+class Export(Thread):
+    """
+    Exports a snapshot of the logged data into an excel file. The snapshot is taken when the export is created, the
+    workbook is written as a stream, row by row, so the memory needed does not depend on the amount of data
+    """
+    progress: float  # Written fraction of all rows (0 - 1)
+    cancelled: Event
+
+    def __init__(self):
+        """
+        Take a snapshot of the logged data
+        """
+        super().__init__(name="excel export")
+        self.progress = 0.0
+        self.cancelled = Event()
+        self.iteration = sim.iteration
+        self.realtime = sim.loop.realtime
+        self.scenario = sim.scenarios.selected()
+        self.perf_time = sim.data.perf_time.snapshot()
+        self.perf_mean = sim.data.perf_time.statistics.mean if sim.data.perf_time.statistics.count else None
+        self.header = ["real time [s]"]
+        self.columns = [sim.data.realtime.snapshot()]
+        self.statistics = []  # Name, minimum, maximum and mean of every exported channel
+        for sceneobj in sim.scene.data:
+            for plot, info in sceneobj.data.items():
+                if not info["export"]:
+                    # Dont export
+                    continue
+                self.header.append(sceneobj.name + " - " + plot)
+                self.columns.append(info["data"].snapshot())
+                statistics = info["data"].statistics
+                if statistics.count:
+                    self.statistics.append([self.header[-1], statistics.minimum, statistics.maximum, statistics.mean])
+                else:
+                    self.statistics.append([self.header[-1], None, None, None])
+        self._rows = len(self.perf_time) + min(len(column) for column in self.columns)
+        self._written = 0
+
+    def run(self):
+        """
+        Write the workbook
+        :return:
+        """
+        print("O Starting export")
+        from openpyxl import Workbook  # skipcq: PYL-C0415 - openpyxl takes long to import, it is only needed to export
+        workbook = Workbook(write_only=True)
+
+        simdata = workbook.create_sheet("overview")
+        simdata.sheet_properties.tabColor = "c6b04d"
+        date = datetime.now().strftime("%d.%m.%Y %H:%M:%S")
+        # The channel names of the statistics below are in the first column too
+        sheet_setup(simdata, ["Total iterations", "Total time [s]", "average CPU time per iteration [ns]",
+                              "Export date", "scenario"],
+                    [max([0] + [len(row[0]) for row in self.statistics]), 0, 0, len(date), 0])
+        simdata.append([self.iteration, self.realtime, self.perf_mean,
+                        date, self.scenario])
+        # Statistics of all samples, including the ones a min/max store did not keep
+        simdata.append([])
+        simdata.append(["channel", "minimum", "maximum", "mean"])
+        for row in self.statistics:
+            simdata.append(row)
+
+        performance = workbook.create_sheet("performance")
+        performance.sheet_properties.tabColor = "d6af15"
+        sheet_setup(performance, ["cpu time [ns]"])
+        if not self._write_columns(performance, [self.perf_time]):
+            return
+
+        alldata = workbook.create_sheet("all data")
+        alldata.sheet_properties.tabColor = "15d6d6"
+        sheet_setup(alldata, self.header)
+        if not self._write_columns(alldata, self.columns):
+            return
+
+        file = path.join(directory, f"ballz_data_{int(round(datetime.now().timestamp()))}.xlsx")
+        workbook.save(file)
+        self.progress = 1.0
+        print("OK Export complete! Saved " + file)
+
+    def cancel(self):
+        """
+        Stop the export, nothing will be saved
+        :return:
+        """
+        self.cancelled.set()
+
+    def _write_columns(self, sheet: "worksheet", columns: List[Sequence[float]]) -> bool:
+        """
+        Append columns of data to a sheet, batch_size rows at a time
+        :param sheet: The sheet to write to
+        :param columns: The columns (numpy arrays), the rows end with the shortest column
+        :return: False if the export has been cancelled
+        """
+        rows = min(len(column) for column in columns)
+        for start in range(0, rows, batch_size):
+            if self.cancelled.is_set():
+                print("OK Export cancelled")
+                return False
+            end = min(start + batch_size, rows)
+            for row in zip(*(column[start:end].tolist() for column in columns)):
+                sheet.append(row)
+            self._written += end - start
+            # Saving the file takes a moment too, keep the last percent for it
+            self.progress = 0.99 * self._written / max(self._rows, 1)
+        return True
+
 
-# Gather data and export it into an excel file
 def export_excel():
     """
-    Export data into an excel file
+    Export data into an excel file and wait until it is saved
     :return:
     """
-    print("O Starting export", end="")
-    workbook = Workbook()
-    del workbook["Sheet"]
-    workbook.create_sheet("overview")
-    workbook.create_sheet("performance")
-    workbook.create_sheet("all data")
-
-    simdata = workbook["overview"]
-    simdata.sheet_properties.tabColor = "c6b04d"
-
-    simdata.cell(row=1, column=1).value = "Total iterations"
-    simdata.column_dimensions[utils.get_column_letter(1)].width = len("Total iterations")
-    simdata.cell(row=2, column=1).value = sim.iteration
-
-    simdata.cell(row=1, column=2).value = "Total time [s]"
-    simdata.column_dimensions[utils.get_column_letter(2)].width = len("Total time [s]")
-    simdata.cell(row=2, column=2).value = sim.loop.realtime
-
-    simdata.cell(row=1, column=3).value = "average CPU time per iteration [s]"
-    print("\r\033[K\rO Calculating average cpu time", end="")
-    simdata.column_dimensions[utils.get_column_letter(3)].width = len("average CPU time per iteration [ns]")
-    simdata.cell(row=2, column=3).value = sum(sim.data.perf_time) / len(sim.data.perf_time)
-
-    simdata.cell(row=1, column=4).value = "Export date"
-    simdata.cell(row=2, column=4).value = datetime.now().strftime("%d.%m.%Y %H:%M:%S")
-    simdata.column_dimensions[utils.get_column_letter(4)].width = len(datetime.now().strftime("%d.%m.%Y %H:%M:%S"))
-
-    simdata.cell(row=1, column=5).value = "scenario"
-    simdata.column_dimensions[utils.get_column_letter(1)].width = len("scenaro")
-    simdata.cell(row=2, column=5).value = sim.scenarios.selected()
-
-    simdata = workbook["performance"]
-    simdata.sheet_properties.tabColor = "d6af15"
-    print("\r\033[K\rO Saving performance data", end="")
-    simdata.cell(row=1, column=1).value = "cpu time [ns]"
-    row = 2
-    for perf_data in sim.data.perf_time:
-        simdata.cell(row=row, column=1).value = perf_data
-        row += 1
-
-    alldata = workbook["all data"]
-    alldata.sheet_properties.tabColor = "15d6d6"
-    alldatacolumn = 2
-    sheet_setup(workbook["all data"])
-
-    for sceneobj in sim.scene.data:
-        workbook.create_sheet(sceneobj.name)
-        sheet = workbook[sceneobj.name]
-        sheet.sheet_properties.tabColor = "802f8e"
-        # sheet_setup(sheet)
-        cell = 1
-        for plot, info in sceneobj.data.items():
-            if not info["export"]:
-                # Dont export
-                continue
-            data = info["data"]
-            print("\r\033[K\rO Saving " + plot + " from " + sceneobj.name, end="")
-            sheet.cell(row=1, column=cell).value = plot
-            alldata.cell(row=1, column=alldatacolumn).value = sceneobj.name + " - " + plot
-            sheet.column_dimensions[utils.get_column_letter(cell)].width = len(plot)
-            alldata.column_dimensions[utils.get_column_letter(alldatacolumn)].width = len(plot)
-            row = 2
-            for point in data:
-                sheet.cell(row=row, column=cell).value = point
-                alldata.cell(row=row, column=alldatacolumn).value = point
-                row += 1
-            cell += 1
-            alldatacolumn += 1
-
-    print("\r\033[K\rO Saving workbook to file", end="")
-    workbook.save(f"exports/ballz_data_{int(round(datetime.now().timestamp()))}.xlsx")
-    print("\r\033[K\rOK Export complete!")
-
-
-def sheet_setup(sheet: worksheet):
+    Export().run()
+
+
+def start():
+    """
+    Start exporting the current data in the background
+    :return:
+    """
+    global current  # skipcq: PYL-W0603 - there is only one export at a time
+    if running():
+        print("! An export is already running")
+        return
+    current = Export()
+    current.start()
+
+
+def cancel():
+    """
+    Cancel the running export
+    :return:
+    """
+    if running():
+        current.cancel()
+
+
+def running() -> bool:
+    """
+    Check if an export is running in the background
+    :return: Whether an export is running
+    """
+    return current is not None and current.is_alive()
+
+
+def status() -> str:
+    """
+    Describe the progress of the running export
+    :return: Text for the status bar, empty if no export is running
+    """
+    if not running():
+        return ""
+    if current.cancelled.is_set():
+        return "cancelling export"
+    return f"exporting {int(current.progress * 100)}% | C to cancel"
+
+
+def sheet_setup(sheet: "worksheet", header: List[str], widths: List[int] = None):
     """
-    Setup a sheet with the delta_t column
+    Write the header row of a sheet and fit the columns to it. Write only sheets ignore widths set after the first row
     :param sheet: The sheet to set up
+    :param header: Name of every column
+    :param widths: Minimum width of every column
     :return:
     """
-    sheet.cell(row=1, column=1).value = "real time [s]"
-    sheet.column_dimensions[utils.get_column_letter(1)].width = len("real time [s]")
-
-    iteration = 2
-    print("\r\033[K\rO Saving real time data", end="")
-    for time in sim.data.realtime:
-        sheet.cell(row=iteration, column=1).value = time
-        iteration += 1
+    from openpyxl import utils  # skipcq: PYL-C0415 - openpyxl takes long to import, it is only needed to export
+    for column, name in enumerate(header, start=1):
+        width = len(name) if widths is None else max(len(name), widths[column - 1])
+        sheet.column_dimensions[utils.get_column_letter(column)].width = width
+    sheet.append(header)
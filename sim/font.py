@@ -1,16 +1,32 @@
 """
-Responsible for font loading
+Responsible for font loading and rendering texts. Rendered texts are kept in a cache of limited size, numbers that
+change every frame are put together from pre-rendered glyphs
 """
+import re
+from collections import OrderedDict
+from os import path
+from typing import Dict, Optional, Tuple
+
 import pygame
 
 import sim
 from utils import pool
 
-main_font: pygame.font.SysFont
+main_font: pygame.font.Font
 small_font_size: int = 50
-small_font: pygame.font.SysFont
+small_font: pygame.font.Font
 normal_font_size: int = 100
 
+Color = Tuple[int, int, int]
+BLACK: Color = (0, 0, 0)
+DIGITS = "0123456789."  # Characters drawn from the glyph atlases
+cache_size = 512  # Rendered texts kept in the cache, the least recently used one is dropped first
+
+_cache: "OrderedDict[tuple, pygame.Surface]" = OrderedDict()  # Rendered texts by (font, text, color, background)
+Atlas = Tuple[pygame.Surface, Dict[str, pygame.Rect]]  # Surface with the glyphs of DIGITS and the area of every glyph
+_atlases: Dict[tuple, Atlas] = {}  # By (font, color, background), every glyph is as high as the atlas
+_runs = re.compile(f"[{re.escape(DIGITS)}]+|[^{re.escape(DIGITS)}]+")
+
 
 def init():
     """
@@ -18,10 +34,122 @@ def init():
     """
     print("O Loading font system", end="")
     pygame.font.init()
+    _cache.clear()
+    _atlases.clear()
     sim.font.small_font_size = sim.window.width // 70
     sim.font.normal_font_size = sim.window.width // 30
-    print("\r\033[K\rO Loading " + pool.open("config.json").json["font"].lower() + f" size {sim.font.normal_font_size}", end="")
-    sim.font.main_font = pygame.font.SysFont(pool.open("config.json").json["font"], sim.font.normal_font_size)
-    print("\r\033[K\rO Loading " + pool.open("config.json").json["font"].lower() + f" size {sim.font.small_font_size}", end="")
-    sim.font.small_font = pygame.font.SysFont(pool.open("config.json").json["font"], sim.font.small_font_size)
+    file = font_path()
+    name = pool.open("config.json").json["font"].lower()
+    print("\r\033[K\rO Loading " + name + f" size {sim.font.normal_font_size}", end="")
+    sim.font.main_font = pygame.font.Font(file, sim.font.normal_font_size)
+    print("\r\033[K\rO Loading " + name + f" size {sim.font.small_font_size}", end="")
+    sim.font.small_font = pygame.font.Font(file, sim.font.small_font_size)
     print("\r\033[K\rOK Font loading complete!")
+
+
+def font_path() -> Optional[str]:
+    """
+    Find the file of the configured font. Searching the system fonts is slow, so the result is saved in config.json
+    ("font_path") and only searched again when the font changes or the file is gone. A font that was not found is
+    searched again once pygame is updated (remove "font_path" from config.json after installing the font)
+    :return: Path of the font file, None for pygame's default font
+    """
+    config_file = pool.open("config.json")
+    config = config_file.json
+    cached = config.get("font_path", {})
+    if cached.get("font") == config["font"]:
+        if cached["path"] is None and cached.get("pygame") == pygame.version.ver:
+            return None
+        if cached["path"] is not None and path.isfile(cached["path"]):
+            return cached["path"]
+    print("\r\033[K\rO Searching system fonts for " + config["font"].lower(), end="")
+    config["font_path"] = {"font": config["font"], "path": pygame.font.match_font(config["font"]),
+                           "pygame": pygame.version.ver}
+    config_file.save()
+    return config["font_path"]["path"]
+
+
+def render(text: str, color: Color, background: Optional[Color] = BLACK,
+           font: pygame.font.Font = None) -> pygame.Surface:
+    """
+    Render a text or return it from the cache. Use it for texts that are drawn again (titles, labels), use blit for
+    texts with numbers that change every frame
+    :param text: The text to render
+    :param color: Color of the text
+    :param background: Background of the text, None is no background
+    :param font: The font, defaults to the small font
+    :return: The rendered text, do not draw onto it
+    """
+    font = font or small_font
+    key = (font, text, color, background)
+    rendered = _cache.get(key)
+    if rendered is not None:
+        _cache.move_to_end(key)
+        return rendered
+    rendered = font.render(text, True, color, background)
+    _cache[key] = rendered
+    if len(_cache) > cache_size:
+        _cache.popitem(last=False)
+    return rendered
+
+
+def _atlas(font: pygame.font.Font, color: Color, background: Optional[Color]) -> Atlas:
+    """
+    Get the glyph atlas of a font and color, it is rendered the first time it is used
+    :param font: The font
+    :param color: Color of the glyphs
+    :param background: Background of the glyphs, None is no background
+    :return: The atlas and the area of every glyph on it
+    """
+    key = (font, color, background)
+    if key not in _atlases:
+        glyphs = [font.render(character, True, color, background) for character in DIGITS]
+        size = (sum(glyph.get_width() for glyph in glyphs), max(glyph.get_height() for glyph in glyphs))
+        atlas = pygame.Surface(size, pygame.SRCALPHA if background is None else 0)
+        if background is not None:
+            atlas.fill(background)
+        areas = {}
+        x = 0
+        for character, glyph in zip(DIGITS, glyphs):
+            atlas.blit(glyph, (x, 0))
+            areas[character] = pygame.Rect(x, 0, glyph.get_width(), size[1])
+            x += glyph.get_width()
+        _atlases[key] = atlas, areas
+    return _atlases[key]
+
+
+def blit(target: pygame.Surface, text: str, color: Color, background: Optional[Color] = BLACK,
+         font: pygame.font.Font = None, **position) -> pygame.Rect:
+    """
+    Draw a text with changing numbers without rendering it. Digits are copied from the glyph atlas, the text in between
+    comes from the cache
+    :param target: The surface to draw onto
+    :param text: The text to draw
+    :param color: Color of the text
+    :param background: Background of the text, None is no background
+    :param font: The font, defaults to the small font
+    :param position: Where to draw, any attribute of pygame.Rect (center=(x, y), topleft=(x, y), ...)
+    :return: The area that was drawn to
+    """
+    font = font or small_font
+    atlas, areas = _atlas(font, color, background)
+    parts = []  # (surface, x offset, area) of every glyph and every run of other characters
+    width = 0
+    height = atlas.get_height()
+    for run in _runs.findall(text):
+        if run[0] in areas:
+            for character in run:
+                area = areas[character]
+                parts.append((atlas, width, area))
+                width += area.width
+        else:
+            rendered = render(run, color, background, font)
+            parts.append((rendered, width, None))
+            width += rendered.get_width()
+            height = max(height, rendered.get_height())
+    rect = pygame.Rect(0, 0, width, height)
+    for attribute, value in position.items():
+        setattr(rect, attribute, value)
+    x, y = rect.topleft
+    target.blits([(surface, (x + offset, y), area) for surface, offset, area in parts], False)
+    return target.get_clip().clip(rect)
@@ -0,0 +1,130 @@
+"""
+Runs scenarios without a window (see sim.core), pygame is never imported.
+Usage: python -m sim.headless [-s SCENARIO ...] (-d SECONDS | -n ITERATIONS) [-o DIRECTORY] [--ensemble]
+"""
+import argparse
+import csv
+import sys
+from datetime import datetime
+from os import path, makedirs
+from time import perf_counter_ns
+from typing import Dict, List, Sequence
+
+import sim
+from sim.core import Simulation
+from sim.ensemble import Ensemble, CHANNELS
+
+progress_every = 100000  # How many iterations to simulate between two progress updates
+
+
+def run(scenario: dict, iterations: int, name: str = "scenario") -> Simulation:
+    """
+    Simulate a scenario without rendering anything
+    :param scenario: The scenario (one entry of the "scenarios" list)
+    :param iterations: Number of iterations to simulate
+    :param name: Name to show in the progress output
+    :return: The simulation holding the logged data
+    """
+    simulation = Simulation(scenario)
+    start = perf_counter_ns()
+    while simulation.iteration < iterations:
+        print(f"\r\033[K\rO Simulating {name} ({simulation.iteration * 100 // iterations}%)", end="")
+        simulation.run(min(progress_every, iterations - simulation.iteration))
+    took = (perf_counter_ns() - start) / 1e9
+    print(f"\r\033[K\rOK Simulated {name}: {iterations} iterations ({iterations * simulation.delta_t}s) in "
+          f"{round(took, 3)}s")
+    return simulation
+
+
+def run_ensemble(scenarios: List[dict], iterations: int) -> List[Dict[str, Sequence[float]]]:
+    """
+    Simulate several scenarios at once using the vectorized ensemble engine
+    :param scenarios: The scenarios, all of them need the same delta_t and log_every
+    :param iterations: Number of iterations to simulate
+    :return: The exported channels of every scenario (see columns)
+    """
+    delta_t = scenarios[0]["simulation"]["delta_t"]
+    log_every = scenarios[0]["simulation"]["log_every"]
+    for scenario in scenarios:
+        if scenario["simulation"]["delta_t"] != delta_t or scenario["simulation"]["log_every"] != log_every:
+            print("! All scenarios of an ensemble need the same delta_t and log_every!")
+            sys.exit(1)
+        if scenario["simulation"].get("integrator", "euler") != "euler":
+            print("! The ensemble engine only supports the euler integrator!")
+            sys.exit(1)
+
+    print(f"\r\033[K\rO Simulating {len(scenarios)} scenarios as an ensemble", end="")
+    start = perf_counter_ns()
+    realtime, history = Ensemble.from_scenarios(scenarios).simulate(delta_t, iterations, log_every)
+    took = (perf_counter_ns() - start) / 1e9
+    print(f"\r\033[K\rOK Simulated {len(scenarios)} scenarios: {iterations} iterations ({iterations * delta_t}s) "
+          f"in {round(took, 3)}s")
+    results = []
+    for index in range(len(scenarios)):
+        result = {"real time [s]": realtime}
+        for channel, quantity in CHANNELS.items():
+            result[channel] = history[quantity][:, index]
+        results.append(result)
+    return results
+
+
+def write(channels: Dict[str, Sequence[float]], file: str):
+    """
+    Write channels into a csv file
+    :param channels: The channels to write, one column each
+    :param file: Path of the csv file
+    :return:
+    """
+    print("\r\033[K\rO Writing " + file, end="")
+    makedirs(path.dirname(file) or ".", exist_ok=True)
+    with open(file, "w", newline="", encoding="utf-8") as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(channels.keys())
+        writer.writerows(zip(*channels.values()))
+    print("\r\033[K\rOK Saved " + file)
+
+
+def main(argv: List[str] = None):
+    """
+    Parse the command line and run the requested scenarios
+    :param argv: Command line arguments, defaults to sys.argv
+    :return:
+    """
+    parser = argparse.ArgumentParser(prog="python -m sim.headless",
+                                     description="Simulate scenarios from scenarios.json without a window")
+    parser.add_argument("-s", "--scenario", type=int, nargs="+",
+                        help="Scenarios to simulate (default: the selected scenario)")
+    length = parser.add_mutually_exclusive_group(required=True)
+    length.add_argument("-d", "--duration", type=float, help="Simulated time [s]")
+    length.add_argument("-n", "--iterations", type=int, help="Number of iterations")
+    parser.add_argument("-o", "--output", default="exports", help="Directory to save the data to (default: exports)")
+    parser.add_argument("-e", "--ensemble", action="store_true",
+                        help="Simulate all scenarios at once with the vectorized ensemble engine")
+    args = parser.parse_args(argv)
+
+    scenarios = sim.scenarios.scenarios.json["scenarios"]
+    selected = args.scenario if args.scenario is not None else [sim.scenarios.selected()]
+    for index in selected:
+        if not 0 <= index < len(scenarios):
+            print(f"! Scenario {index} not defined!")
+            sys.exit(1)
+
+    timestamp = int(round(datetime.now().timestamp()))
+    if args.iterations is not None:
+        iterations = [args.iterations] * len(selected)
+    else:
+        iterations = [int(round(args.duration / scenarios[index]["simulation"]["delta_t"])) for index in selected]
+
+    if args.ensemble:
+        results = run_ensemble([scenarios[index] for index in selected], iterations[0])
+    else:
+        results = []
+        for index, scenario_iterations in zip(selected, iterations):
+            results.append(run(scenarios[index], scenario_iterations, f"scenario {index}").columns())
+
+    for index, result in zip(selected, results):
+        write(result, path.join(args.output, f"ballz_headless_{index}_{timestamp}.csv"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,335 @@
+"""
+Integrators that can be selected per scenario instead of the built-in semi-implicit euler step of ElasticBand.
+Set "integrator" in the "simulation" block of a scenario:
+    "euler"   the built-in semi-implicit euler step (default)
+    "rk4"     classic 4th order Runge-Kutta with a fixed step of delta_t
+    "verlet"  velocity verlet (leapfrog) with a fixed step of delta_t
+    "dopri5"  adaptive Dormand-Prince 5(4) with dense output, uses "atol" and "rtol" (default 1e-9)
+
+Run python -m sim.accuracy to compare the error and cost of the fixed step integrators at different delta_t.
+"""
+from __future__ import annotations
+
+import sys
+from math import copysign, sqrt
+from typing import List, Tuple
+
+import sim
+
+State = Tuple[float, float, float, float]  # length, velocity of ball, angle theta, angular velocity theta
+
+
+def derivatives(band: sim.objects.ElasticBand, state: State) -> State:
+    """
+    Evaluate the equations of motion of an elastic band (the same ones ElasticBand.physics_tick uses)
+    :param band: The band to take the constants from
+    :param state: The state to evaluate them at
+    :return: The time derivative of the state
+    """
+    length, velocity, theta, angular_velocity = state
+    acceleration = (
+                           - 1.42 * band.spring_constant
+                           * max(length - band.normal_length, 0)
+                           - 2 * band.ball_mass * sim.constants.g
+                           * (band.friction_coefficient * copysign(1, velocity))
+                           + (angular_velocity * angular_velocity) * band.ball_mass * length
+                   ) / band.ball_mass
+    angular_acceleration = (
+                                   (-2 * band.ball_torsion_constant) * ((theta * length) / band.ball_radius)
+                                   - band.ball_roll_friction_constant
+                                   * band.ball_mass * sim.constants.g
+                           ) / (2 * (band.ball_moment_of_inertia + band.ball_mass * (length * length)))
+    return velocity, acceleration, angular_velocity, angular_acceleration
+
+
+def _state(band: sim.objects.ElasticBand) -> State:
+    """
+    Read the state of a band
+    :param band: The band to read
+    :return: The current state
+    """
+    return band.length, band.velocity_of_ball, band.angle_theta, band.angular_velocity_theta
+
+
+def _apply(band: sim.objects.ElasticBand, state: State, derivative: State):
+    """
+    Write a state and its derivative into a band
+    :param band: The band to write to
+    :param state: The new state
+    :param derivative: Time derivative of the new state (to set the accelerations)
+    :return:
+    """
+    band.length, band.velocity_of_ball, band.angle_theta, band.angular_velocity_theta = state
+    band.acceleration_of_ball = derivative[1]
+    band.angular_acceleration_theta = derivative[3]
+
+
+class Integrator:
+    """
+    Advances an elastic band by one time step
+    """
+    evaluations: int = 0  # Number of times the equations of motion have been evaluated
+    adaptive: bool = False  # The step size depends on earlier ticks, so a replay after reset takes different steps
+
+    def tick(self, band: sim.objects.ElasticBand, delta_t: float):
+        """
+        Advance the band by delta_t
+        :param band: The band to advance
+        :param delta_t: delta time used
+        :return:
+        """
+
+    def reset(self):
+        """
+        Forget everything about earlier ticks, the next tick starts from the state of the band
+        :return:
+        """
+
+
+class RungeKutta4(Integrator):
+    """
+    Classic 4th order Runge-Kutta integrator with a fixed step. The derivative at the end of a step sets the
+    accelerations and is the first stage of the next step, as long as the state of the band was not changed in between
+    """
+    _state: State = None  # state at the end of the last step
+    _derivative: State = None  # derivative at the end of the last step
+
+    def tick(self, band: sim.objects.ElasticBand, delta_t: float):
+        """
+        Advance the band by one step of delta_t
+        :param band: The band to advance
+        :param delta_t: delta time used
+        :return:
+        """
+        y0 = _state(band)
+        if y0 == self._state:
+            k1 = self._derivative
+        else:
+            k1 = derivatives(band, y0)
+            self.evaluations += 1
+        k2 = derivatives(band, tuple(y0[i] + delta_t / 2 * k1[i] for i in range(4)))
+        k3 = derivatives(band, tuple(y0[i] + delta_t / 2 * k2[i] for i in range(4)))
+        k4 = derivatives(band, tuple(y0[i] + delta_t * k3[i] for i in range(4)))
+        y1 = tuple(y0[i] + delta_t / 6 * (k1[i] + 2 * k2[i] + 2 * k3[i] + k4[i]) for i in range(4))
+        self._state = y1
+        self._derivative = derivatives(band, y1)
+        self.evaluations += 4
+        _apply(band, y1, self._derivative)
+
+    def reset(self):
+        """
+        Forget the last step, the next tick evaluates the first stage again
+        :return:
+        """
+        self._state = None
+        self._derivative = None
+
+
+class VelocityVerlet(Integrator):
+    """
+    Velocity verlet (leapfrog) integrator with a fixed step. The accelerations also depend on the velocities
+    (friction, centrifugal force), so the new accelerations are evaluated at the euler predicted velocities.
+    Needs one evaluation per step.
+    """
+
+    def tick(self, band: sim.objects.ElasticBand, delta_t: float):
+        """
+        Advance the band by one step of delta_t
+        :param band: The band to advance
+        :param delta_t: delta time used
+        :return:
+        """
+        length, velocity, theta, angular_velocity = _state(band)
+        if self.evaluations == 0:
+            # The accelerations of a new band have not been calculated yet
+            _, acceleration, _, angular_acceleration = derivatives(band, _state(band))
+            self.evaluations += 1
+        else:
+            acceleration, angular_acceleration = band.acceleration_of_ball, band.angular_acceleration_theta
+
+        length += delta_t * velocity + delta_t * delta_t / 2 * acceleration
+        theta += delta_t * angular_velocity + delta_t * delta_t / 2 * angular_acceleration
+        new = derivatives(band, (length, velocity + delta_t * acceleration,
+                                 theta, angular_velocity + delta_t * angular_acceleration))
+        self.evaluations += 1
+        velocity += delta_t / 2 * (acceleration + new[1])
+        angular_velocity += delta_t / 2 * (angular_acceleration + new[3])
+        _apply(band, (length, velocity, theta, angular_velocity), new)
+
+
+class DormandPrince(Integrator):
+    """
+    Adaptive Dormand-Prince 5(4) integrator. It takes internal steps as large as the tolerances allow and uses the
+    dense output of the last step to produce the state at the end of every tick, so logging at a fixed delta_t still
+    works while the number of evaluations only depends on how fast the state changes.
+    """
+    adaptive = True
+    atol: float
+    rtol: float
+    max_step: float
+    min_step: float
+
+    _time: float  # time of the last tick [s]
+    _step_start: float  # start of the last accepted internal step [s]
+    _step: float  # size of the last accepted internal step [s]
+    _next_step: float  # size of the next internal step [s]
+    _state: State  # state at the end of the last accepted internal step
+    _derivative: State  # derivative at the end of the last accepted internal step (first stage of the next step)
+    _dense: List[State]  # coefficients of the dense output of the last accepted step
+
+    # Butcher tableau (the equations of motion do not depend on time, so the nodes are not needed)
+    A = ((1 / 5,),
+         (3 / 40, 9 / 40),
+         (44 / 45, -56 / 15, 32 / 9),
+         (19372 / 6561, -25360 / 2187, 64448 / 6561, -212 / 729),
+         (9017 / 3168, -355 / 33, 46732 / 5247, 49 / 176, -5103 / 18656),
+         (35 / 384, 0, 500 / 1113, 125 / 192, -2187 / 6784, 11 / 84))
+    # Difference between the 5th and 4th order solution
+    E = (71 / 57600, 0, -71 / 16695, 71 / 1920, -17253 / 339200, 22 / 525, -1 / 40)
+    # Dense output (Hairer, Norsett & Wanner)
+    D = (-12715105075 / 11282082432, 0, 87487479700 / 32700410799, -10690763975 / 1880347072,
+         701980252875 / 199316789632, -1453857185 / 822651844, 69997945 / 29380423)
+
+    def __init__(self, atol: float = 1e-9, rtol: float = 1e-9, max_step: float = 0.0, min_step: float = 1e-12):
+        """
+        Create a new adaptive integrator
+        :param atol: Absolute tolerance of every state variable
+        :param rtol: Relative tolerance of every state variable
+        :param max_step: [s] Upper limit for the internal step size, 0 for no limit
+        :param min_step: [s] Steps this small are accepted even if they miss the tolerances
+        """
+        self.atol = atol
+        self.rtol = rtol
+        self.max_step = max_step
+        self.min_step = min_step
+        self._time = 0.0
+        self._step_start = 0.0
+        self._step = 0.0
+        self._next_step = 0.0
+        self._dense = []
+
+    def tick(self, band: sim.objects.ElasticBand, delta_t: float):
+        """
+        Advance the band by delta_t, taking as many internal steps as needed
+        :param band: The band to advance
+        :param delta_t: delta time used
+        :return:
+        """
+        if not self._dense:
+            # First tick, start from the state of the band
+            self._state = _state(band)
+            self._derivative = derivatives(band, self._state)
+            self.evaluations += 1
+            self._next_step = delta_t if self.max_step == 0 else min(delta_t, self.max_step)
+            self._dense = [self._state, (0.0,) * 4, (0.0,) * 4, (0.0,) * 4, (0.0,) * 4]
+        target = self._time + delta_t
+        while self._step_start + self._step < target:
+            self._advance(band)
+        self._time = target
+        theta = (target - self._step_start) / self._step
+        if theta == 1:
+            # The tick ends with the step, its last stage is the derivative there (first same as last)
+            _apply(band, self._state, self._derivative)
+        else:
+            _apply(band, self._interpolate(theta), self._interpolate_derivative(theta))
+
+    def reset(self):
+        """
+        Forget the last internal step, the next tick starts from the state of the band
+        :return:
+        """
+        self._time = 0.0
+        self._step_start = 0.0
+        self._step = 0.0
+        self._next_step = 0.0
+        self._dense = []
+
+    def _advance(self, band: sim.objects.ElasticBand):
+        """
+        Take one accepted internal step (retrying with smaller steps until the error is small enough)
+        :param band: The band to take the constants from
+        :return:
+        """
+        y0 = self._state
+        k1 = self._derivative
+        while True:
+            h = self._next_step
+            stages = [k1]
+            for a in self.A:
+                y = tuple(y0[i] + h * sum(a[j] * stages[j][i] for j in range(len(a))) for i in range(4))
+                stages.append(derivatives(band, y))
+            self.evaluations += 6
+            # The last stage is evaluated at the 5th order solution (first same as last)
+            y1 = y
+            error = 0.0
+            for i in range(4):
+                scale = self.atol + self.rtol * max(abs(y0[i]), abs(y1[i]))
+                error += (h * sum(self.E[j] * stages[j][i] for j in range(7)) / scale) ** 2
+            error = sqrt(error / 4)
+
+            factor = 10.0 if error == 0 else min(10.0, max(0.2, 0.9 * error ** -0.2))
+            self._next_step = h * factor
+            if self.max_step != 0:
+                self._next_step = min(self._next_step, self.max_step)
+            if error <= 1 or h <= self.min_step:
+                break
+            self._next_step = max(self._next_step, self.min_step)
+
+        change = tuple(y1[i] - y0[i] for i in range(4))
+        slope = tuple(h * k1[i] - change[i] for i in range(4))
+        self._dense = [y0, change, slope,
+                       tuple(change[i] - h * stages[6][i] - slope[i] for i in range(4)),
+                       tuple(h * sum(self.D[j] * stages[j][i] for j in range(7)) for i in range(4))]
+        self._step_start += self._step
+        self._step = h
+        self._state = y1
+        self._derivative = stages[6]
+
+    def _interpolate(self, theta: float) -> State:
+        """
+        Evaluate the dense output of the last accepted step
+        :param theta: Position inside the step (0 = start, 1 = end)
+        :return: The interpolated state
+        """
+        theta1 = 1 - theta
+        y0, change, slope, curve, correction = self._dense
+        return tuple(y0[i] + theta * (change[i] + theta1 * (slope[i] + theta * (curve[i] + theta1 * correction[i])))
+                     for i in range(4))
+
+    def _interpolate_derivative(self, theta: float) -> State:
+        """
+        Differentiate the dense output of the last accepted step, so the accelerations between the steps need no
+        evaluation of the equations of motion
+        :param theta: Position inside the step (0 = start, 1 = end)
+        :return: The time derivative of the interpolated state
+        """
+        theta1 = 1 - theta
+        _, change, slope, curve, correction = self._dense
+        result = []
+        for i in range(4):
+            inner = curve[i] + theta1 * correction[i]
+            outer = slope[i] + theta * inner
+            derivative = theta1 * (inner - theta * correction[i]) - outer
+            result.append((change[i] + theta1 * outer + theta * derivative) / self._step)
+        return tuple(result)
+
+
+def create(simulation: dict) -> Integrator:
+    """
+    Create the integrator selected in the "simulation" block of a scenario
+    :param simulation: The "simulation" block
+    :return: The integrator or None for the built-in euler step
+    """
+    name = simulation.get("integrator", "euler")
+    if name == "euler":
+        return None
+    if name == "rk4":
+        return RungeKutta4()
+    if name in ("verlet", "leapfrog"):
+        return VelocityVerlet()
+    if name == "dopri5":
+        return DormandPrince(simulation.get("atol", 1e-9), simulation.get("rtol", 1e-9),
+                             simulation.get("max_step", 0.0), simulation.get("min_step", 1e-12))
+    print(f"! Unknown integrator {name}!")
+    sys.exit(1)
+
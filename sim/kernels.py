@@ -0,0 +1,86 @@
+"""
+Generates the step function of an elastic band for one scenario. The constants of the band and delta_t are written into
+the source code as literals (products of constants are calculated once), and the state is kept in local variables for
+a whole batch of steps, it is only written back to the band at the end of the batch.
+
+The generated code uses the same operations in the same order as ElasticBand.physics_tick, so it produces exactly the
+same results. Bands with an integrator (see sim.integrators) get a kernel that calls the integrator every step.
+"""
+from __future__ import annotations
+
+from math import copysign
+from typing import Callable
+
+import sim
+
+Kernel = Callable[["sim.objects.ElasticBand", int], None]  # Advances a band by a number of steps
+
+TEMPLATE = """
+def advance(band, n_steps):
+    length = band.length
+    velocity = band.velocity_of_ball
+    acceleration = band.acceleration_of_ball
+    angle = band.angle_theta
+    angular_velocity = band.angular_velocity_theta
+    angular_acceleration = band.angular_acceleration_theta
+    for _ in range(n_steps):
+        acceleration = (
+            {spring} * max(length - {normal_length}, 0)
+            - {friction_force} * ({friction_coefficient} * copysign(1, velocity))
+            + (angular_velocity * angular_velocity) * {mass} * length
+        ) / {mass}
+        velocity = velocity + {delta_t} * acceleration
+        length = length + {delta_t} * velocity
+        angular_acceleration = (
+            {torsion} * ((angle * length) / {radius})
+            - {roll_friction_force}
+        ) / (2 * ({moment_of_inertia} + {mass} * (length * length)))
+        angular_velocity = angular_velocity + angular_acceleration * {delta_t}
+        angle = angle + angular_velocity * {delta_t}
+    band.length = length
+    band.velocity_of_ball = velocity
+    band.acceleration_of_ball = acceleration
+    band.angle_theta = angle
+    band.angular_velocity_theta = angular_velocity
+    band.angular_acceleration_theta = angular_acceleration
+"""
+
+
+def generate(band: sim.objects.ElasticBand, delta_t: float) -> Kernel:
+    """
+    Generate the step function of a band. Constants of the band that change later are not picked up, generate a new
+    kernel then
+    :param band: The band
+    :param delta_t: delta time of every step
+    :return: The kernel
+    """
+    if band.integrator is not None:
+        integrator = band.integrator
+
+        def advance(elastic_band: sim.objects.ElasticBand, n_steps: int):
+            """
+            Advance a band with its integrator
+            :param elastic_band: The band
+            :param n_steps: Number of steps
+            :return:
+            """
+            tick = integrator.tick
+            for _ in range(n_steps):
+                tick(elastic_band, delta_t)
+        return advance
+
+    g = sim.constants.g
+    # Folded the same way python evaluates physics_tick from left to right, repr keeps every bit of a float
+    source = TEMPLATE.format(spring=repr(-1.42 * band.spring_constant),
+                             normal_length=repr(band.normal_length),
+                             friction_force=repr(2 * band.ball_mass * g),
+                             friction_coefficient=repr(band.friction_coefficient),
+                             mass=repr(band.ball_mass),
+                             delta_t=repr(delta_t),
+                             torsion=repr(-2 * band.ball_torsion_constant),
+                             radius=repr(band.ball_radius),
+                             roll_friction_force=repr(band.ball_roll_friction_constant * band.ball_mass * g),
+                             moment_of_inertia=repr(band.ball_moment_of_inertia))
+    namespace = {}
+    exec(compile(source, "<kernel>", "exec"), {"copysign": copysign}, namespace)  # skipcq: PYL-W0122
+    return namespace["advance"]
@@ -7,16 +7,34 @@ from typing import Callable
 import pygame
 
 import sim
-from utils import pool
+from sim import pipeline, timers
+from utils import git, pool
 
 delta_t = 0.000001  # Time step to simulate
-every = 5000  # How often to render a frame
+fps = 60  # Frames to render per second while simulating
+batch_time = 1000000  # [ns] Time a batch of iterations should take, the clock is only read between batches
+batch = 1  # Iterations per batch, adapts to batch_time
+status_interval = 250  # [ms] How often the export progress is updated while paused
 realtime = 0  # Time passed since start of simulation
 log_every = 1  # How often to log data (set to a higher number to use less RAM)
 
 maxperf = "max_perf" in pool.open("config.json").json and pool.open("config.json").json["max_perf"]
 disable_log = "disable_log" in pool.open("config.json").json and pool.open("config.json").json["disable_log"]
-iteration: Callable[[bool], None]
+iteration: Callable[[], None]
+strides = []  # Strides of the stages of the tick (see sim.pipeline)
+halt = False  # Set by a stage to end the current batch of iterations
+
+# Physics and logging are not timed in max_performance mode. Iterations between two stages are advanced at once, they
+# are timed as one batch, so "physics" only holds single iterations
+_physics = timers.timer("physics")
+_physics_batch = timers.timer("physics batch")  # Iterations no stage runs on, advanced at once
+_log = timers.timer("log")
+_receive = timers.timer("receive")  # Copying the results of the physics process
+_events = timers.timer("event poll")
+_draw_all = timers.timer("draw_all")
+_data_draw = timers.timer("data.draw")
+_static_scene = timers.timer("static_scene.apply")
+_update = timers.timer("display.update")
 
 
 def start():
@@ -24,20 +42,53 @@ def start():
     Start the event loop
     :return:
     """
+    export_status = ""
+    # Only wake up for events that are handled below
+    pygame.event.set_blocked(None)
+    pygame.event.set_allowed([pygame.QUIT, pygame.KEYDOWN, pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP,
+                              pygame.WINDOWEXPOSED])
+    next_frame = perf_counter_ns()
     while sim.running:
-        # Set the last time to now, delta_t will include calculation time of the next step
-        if sim.simulate:
-            iteration(False)
+        frame_time = 1000000000 // fps
+        events = []
+        if sim.simulate and sim.worker.current is not None:
+            # The physics process simulates, only show its results once per frame
+            pygame.time.wait(max(0, next_frame - perf_counter_ns()) // 1000000)
+            start = perf_counter_ns()
+            sim.worker.current.receive()
+            _receive.add(perf_counter_ns() - start)
+            sim.checkpoint.tick()
+            screen()
+        elif sim.simulate:
+            # Simulate for the rest of the frame, then render it
+            simulate_until(next_frame)
+            sim.checkpoint.tick()
+            screen()
+        else:
+            # Nothing to simulate, sleep until there is input. While an export runs, wake up to show its progress
+            event = pygame.event.wait(status_interval) if sim.export.running() else pygame.event.wait()
+            if event.type != pygame.NOEVENT:
+                events.append(event)
+        # Do not catch up with frames that were missed, and leave physics at least a quarter of every frame
+        next_frame = max(next_frame + frame_time, perf_counter_ns() + frame_time // 4)
 
         # Event loop
-        for event in pygame.event.get():
+        start = perf_counter_ns()
+        events += pygame.event.get()
+        _events.add(perf_counter_ns() - start)
+        for event in events:
             if event.type == pygame.QUIT:
                 sim.running = False
                 return
+            if event.type == pygame.WINDOWEXPOSED:
+                # The window was covered, draw it again
+                screen(full=True)
             if event.type == pygame.KEYDOWN:
                 # parse key presses
                 if event.key == pygame.K_e:
-                    sim.export.export_excel()
+                    sim.export.start()
+                if event.key == pygame.K_c:
+                    sim.export.cancel()
                 if event.key == pygame.K_RIGHT:
                     sim.scenarios.next_scenario()
                 if event.key == pygame.K_LEFT:
@@ -45,23 +96,36 @@ def start():
                 if event.key == pygame.K_l:
                     sim.scenarios.reload()
                 if event.key == pygame.K_DOWN:
-                    iteration(True)
+                    step(1)
                 if event.key == pygame.K_PAGEUP:
-                    for _ in range(10):
-                        iteration(False)
-                    screen()
+                    step(10)
                 if event.key == pygame.K_PAGEDOWN:
-                    for _ in range(100):
-                        iteration(False)
-                    screen()
+                    step(100)
                 if event.key == pygame.K_r:
                     sim.scenarios.reset()
+                if event.key == pygame.K_k:
+                    sim.checkpoint.save()
+                if event.key == pygame.K_b:
+                    sim.checkpoint.rewind()
+                    screen()
+                if event.key == pygame.K_f:
+                    sim.checkpoint.resume()
+                    screen()
+                if event.key == pygame.K_t:
+                    timers.toggle_overlay()
+                    screen()
 
+                if event.key == pygame.K_u and git.available.is_set():
+                    sim.restart = True
+                    sim.running = False
+                    return
                 if event.key == pygame.K_ESCAPE:
                     sim.running = False
                     return
                 if event.key == pygame.K_SPACE:
                     sim.simulate = not sim.simulate
+                    if sim.worker.current is not None:
+                        sim.worker.current.simulate(sim.simulate)
             if event.type in (pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP):
                 if event.button == 1:
                     # Parse mouse click
@@ -74,92 +138,155 @@ def start():
                     sim.data.selected = None
                 screen()
 
+        if not sim.simulate and sim.export.status() != export_status:
+            # Keep the export progress up to date while no frames are rendered
+            export_status = sim.export.status()
+            screen()
 
-def generate_tick() -> Callable[[bool], None]:
+
+def step(iterations: int):
     """
-    Return a function that simulates a single time step
-    :return: the tick function
+    Simulate a number of iterations and render a frame
+    :param iterations: Number of iterations
+    :return:
     """
-    if maxperf:
-        if disable_log:
-            def tick(render: bool):
-                """
-                Simulate one iteration
-                :param render: Force render a frame
-                """
-                for obj in sim.scene.objects():
-                    obj.physics_tick(delta_t)
-                sim.iteration += 1
-                if render:
-                    screen()
-                    return
-                if sim.iteration % every == 0:
-                    screen()
-        else:
-            def tick(render: bool):
-                """
-                Simulate one iteration
-                :param render: Force render a frame
-                """
-                for obj in sim.scene.objects():
-                    obj.physics_tick(delta_t)
-                    if sim.iteration % log_every == 0:
-                        obj.log()
-                        sim.loop.realtime += delta_t
-                        sim.data.realtime.append(sim.loop.realtime)
-                sim.iteration += 1
-                if render:
-                    screen()
-                    return
-                if sim.iteration % every == 0:
-                    screen()
+    if sim.worker.current is not None:
+        sim.worker.current.step(iterations)
     else:
-        if disable_log:
-            def tick(render: bool):
-                """
-                Simulate one iteration
-                :param render: Force render a frame
-                """
-                for obj in sim.scene.objects():
-                    obj.physics_tick(delta_t)
-                sim.iteration += 1
-                if render:
-                    screen()
-                    return
-                if sim.iteration % every == 0:
-                    screen()
+        advance(iterations)
+    screen()
+
+
+def advance(iterations: int):
+    """
+    Simulate a number of iterations. The objects advance to the next iteration a stage of the tick runs on at once,
+    those iterations are simulated one by one by the tick. Stops early if a stage sets halt
+    :param iterations: Number of iterations
+    :return:
+    """
+    global halt  # skipcq: PYL-W0603 - stages halt the current batch only
+    halt = False
+    tick = iteration
+    if strides and strides[0] == 1:
+        # A stage runs on every iteration
+        for _ in range(iterations):
+            tick()
+            if halt:
+                return
+        return
+    end = sim.iteration + iterations
+    while sim.iteration < end and not halt:
+        current = sim.iteration
+        if any(current % stride == 0 for stride in strides):
+            tick()
+            continue
+        steps = min([end] + [-(-current // stride) * stride for stride in strides]) - current
+        if maxperf:
+            for obj in sim.scene.objects():
+                obj.advance(steps)
         else:
-            def tick(render: bool):
-                """
-                Simulate one iteration
-                :param render: Force render a frame
-                """
-                precalc = perf_counter_ns()
-                for obj in sim.scene.objects():
-                    obj.physics_tick(delta_t)
-                    if sim.iteration % log_every == 0:
-                        obj.log()
-                        sim.data.perf_time.append(perf_counter_ns() - precalc)
-                        sim.loop.realtime += delta_t
-                        sim.data.realtime.append(sim.loop.realtime)
-                sim.iteration += 1
-                if render:
-                    screen()
-                    return
-                if sim.iteration % every == 0:
-                    screen()
+            start = perf_counter_ns()
+            for obj in sim.scene.objects():
+                obj.advance(steps)
+            _physics_batch.add(perf_counter_ns() - start)
+        sim.iteration += steps
+
+
+def simulate_until(deadline: int):
+    """
+    Simulate as many iterations as fit until a point in time. Iterations run in batches that take about batch_time
+    :param deadline: perf_counter_ns() to stop at
+    :return:
+    """
+    global batch  # skipcq: PYL-W0603 - the batch size is kept for the next frame
+    start = perf_counter_ns()
+    while start < deadline and sim.simulate:
+        advance(batch)
+        end = perf_counter_ns()
+        if end - start < batch_time // 2:
+            batch *= 2
+        elif end - start > batch_time * 2 and batch > 1:
+            batch //= 2
+        start = end
+
+
+def generate_tick() -> Callable[[], None]:
+    """
+    Return a function that simulates a single time step, put together from the stages registered in sim.pipeline
+    :return: the tick function
+    """
+    global strides  # skipcq: PYL-W0603 - advance needs the strides of the current tick
+    tick, strides = pipeline.generate()
     return tick
 
 
+def _log_stage() -> pipeline.Stage:
+    """
+    Log every object on every log_every-th iteration
+    :return: The stage, None if logging is disabled
+    """
+    if disable_log:
+        return None
+    return pipeline.Stage("log", log_every, log="obj.log()")
+
+
+def _timing_stage() -> pipeline.Stage:
+    """
+    Time physics and logging of the logged iterations
+    :return: The stage, None in max_performance mode or if logging is disabled
+    """
+    if maxperf or disable_log:
+        return None
+    return pipeline.Stage("timing", log_every,
+                          {"perf_counter_ns": perf_counter_ns, "physics_timer": _physics, "log_timer": _log},
+                          before_physics="start = perf_counter_ns()",
+                          after_physics="logging = perf_counter_ns()",
+                          after_log="end = perf_counter_ns()\n"
+                                    "physics_timer.add(logging - start)\n"
+                                    "log_timer.add(end - logging)\n"
+                                    "sim.data.perf_time.append(end - start)")
+
+
+def _realtime_stage() -> pipeline.Stage:
+    """
+    Log the real time of every logged iteration
+    :return: The stage, None if logging is disabled
+    """
+    if disable_log:
+        return None
+    return pipeline.Stage("realtime", log_every, {"delta_t": delta_t},
+                          after_log="sim.loop.realtime += delta_t\n"
+                                    "sim.data.realtime.append(sim.loop.realtime)")
+
+
+pipeline.register("log", _log_stage)
+pipeline.register("timing", _timing_stage)
+pipeline.register("realtime", _realtime_stage)
 iteration = generate_tick()
 
 
-def screen():
+def screen(full: bool = False):
     """
-    Update the screen
+    Update the screen. Only the areas that changed are drawn again and sent to the display
+    :param full: Draw and send the whole window (the first frame or after the window was covered)
     :return:
     """
-    sim.scene.draw_all()
-    sim.data.draw()
-    sim.static_scene.apply()
-    pygame.display.flip()
+    start = perf_counter_ns()
+    if full:
+        sim.window.pygame_scene.blit(sim.window.background, (0, 0))
+        sim.data.invalidate()
+    changed = sim.static_scene.clear() + sim.scene.draw_all()
+    scene_drawn = perf_counter_ns()
+    changed += sim.data.draw()
+    data_drawn = perf_counter_ns()
+    changed += sim.static_scene.apply()
+    applied = perf_counter_ns()
+    if full:
+        pygame.display.flip()
+    else:
+        pygame.display.update(changed)
+    end = perf_counter_ns()
+    _draw_all.add(scene_drawn - start)
+    _data_draw.add(data_drawn - scene_drawn)
+    _static_scene.add(applied - data_drawn)
+    _update.add(end - applied)
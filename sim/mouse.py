@@ -11,4 +11,5 @@ def mouse() -> sim.scene_objects.Coordinate:
     Retrieve the current mouse position
     :return: mouse position as coordinates (true coordinates)
     """
-    return sim.scene_objects.Coordinate(pygame.mouse.get_pos()[0], sim.window.height - pygame.mouse.get_pos()[1])
+    x, y = pygame.mouse.get_pos()
+    return sim.scene_objects.Coordinate(x, sim.window.height - y)
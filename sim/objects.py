@@ -4,10 +4,19 @@ A file defining all simulation objects
 from __future__ import annotations
 
 from math import copysign, cos, sin
+from typing import Tuple
+
+import numpy as np
 
 import sim
+from sim import storage
 from sim.scene_objects import SceneObject, Color, Coordinate, DataObject
 
+CENTER_COLOR = Color(0, 125, 0, alpha=10)
+BAND_COLOR = Color(255, 255, 255)
+BALL_COLOR = Color(0, 255, 255)
+OPPOSITE_BALL_COLOR = Color(255, 255, 0)
+
 
 class ElasticBand(SceneObject):
     """
@@ -29,19 +38,25 @@ class ElasticBand(SceneObject):
     ball_moment_of_inertia: float
     ball_torsion_constant: float
     ball_rolling_friction_constant: float
+    integrator: sim.integrators.Integrator = None  # None for the built-in semi-implicit euler step
+    kernel: sim.kernels.Kernel = None  # Step function generated for the scenario (see specialize)
 
+    # length, velocity, acceleration, angle, angular velocity, angular acceleration, x1, y1, x2, y2
+    store: storage.ColumnStore
     band_data: DataObject
     ball_data_1: DataObject
     ball_data_2: DataObject
 
     _ball_coords: Coordinate
     _ball_coords_opposite: Coordinate
+    _points: np.ndarray  # Center and both balls in scene coordinates, reused by every draw
+    _screen: np.ndarray  # The same points in window coordinates
 
     def __init__(self, scene: sim.scene_objects.Scene,
                  current_length: float, normal_length: float, delta: float, center: Coordinate, spring_constant: float,
                  friction_coefficient: float,
                  ball_mass: float, ball_radius: float, ball_torsion_constant: float, ball_roll_friction_constant: float,
-                 name: str):
+                 name: str, integrator: sim.integrators.Integrator = None, store: storage.ColumnStore = None):
         """
         Create a new elastic band with two balls attached to it
         :param scene: Scene of elastic band
@@ -54,6 +69,8 @@ class ElasticBand(SceneObject):
         :param delta: [rad] angle on x-axis between two balls
         :param ball_torsion_constant: Torsion constant of a ball
         :param ball_roll_friction_constant: Rolling friction constant of a ball
+        :param integrator: Integrator to use instead of the built-in semi-implicit euler step
+        :param store: Store to log into (10 columns), defaults to a new store of the kind selected in sim.storage
         """
         super().__init__(scene)
         self.normal_length = normal_length
@@ -67,22 +84,30 @@ class ElasticBand(SceneObject):
         self.ball_torsion_constant = ball_torsion_constant
         self.ball_roll_friction_constant = ball_roll_friction_constant
         self.ball_moment_of_inertia = (2 / 5) * ball_mass * ball_radius ** 2
+        self.integrator = integrator
         self.angle_theta = (ball_radius * delta) / current_length
+        self._ball_coords = Coordinate(0, 0)
+        self._ball_coords_opposite = Coordinate(0, 0)
+        self._points = np.empty((3, 2))
+        self._screen = np.empty((3, 2))
         self._update_coords()
 
-        self.band_data = DataObject(name, {"length [m]": {"data": [], "export": True},
-                                           "ball velocity [m/s]": {"data": [], "export": True},
-                                           "ball acceleration [m/s²]": {"data": [], "export": True}})
-        self.ball_data_1 = DataObject("ball 1", {"angle [rad]": {"data": [], "export": True},
-                                                 "angular velocity [rad/s]": {"data": [], "export": True},
-                                                 "angular acceleration [rad/s²]": {"data": [], "export": True},
-                                                 "x [m]": {"data": [], "export": False},
-                                                 "y [m]": {"data": [], "export": False}})
-        self.ball_data_2 = DataObject("ball 2", {"angle [rad]": {"data": [], "export": True},
-                                                 "angular velocity [rad/s]": {"data": [], "export": True},
-                                                 "angular acceleration [rad/s²]": {"data": [], "export": True},
-                                                 "x [m]": {"data": [], "export": False},
-                                                 "y [m]": {"data": [], "export": False}})
+        self.store = store if store is not None else storage.store(10)
+        columns = self.store.columns
+        self.band_data = DataObject(name, {"length [m]": {"data": columns[0], "export": True},
+                                           "ball velocity [m/s]": {"data": columns[1], "export": True},
+                                           "ball acceleration [m/s²]": {"data": columns[2], "export": True}})
+        # Both balls always have the same angle, they share these columns
+        self.ball_data_1 = DataObject("ball 1", {"angle [rad]": {"data": columns[3], "export": True},
+                                                 "angular velocity [rad/s]": {"data": columns[4], "export": True},
+                                                 "angular acceleration [rad/s²]": {"data": columns[5], "export": True},
+                                                 "x [m]": {"data": columns[6], "export": False},
+                                                 "y [m]": {"data": columns[7], "export": False}})
+        self.ball_data_2 = DataObject("ball 2", {"angle [rad]": {"data": columns[3], "export": True},
+                                                 "angular velocity [rad/s]": {"data": columns[4], "export": True},
+                                                 "angular acceleration [rad/s²]": {"data": columns[5], "export": True},
+                                                 "x [m]": {"data": columns[8], "export": False},
+                                                 "y [m]": {"data": columns[9], "export": False}})
         scene.data = scene.data + [self.band_data, self.ball_data_1, self.ball_data_2]
 
     def _update_coords(self):
@@ -90,30 +115,58 @@ class ElasticBand(SceneObject):
         Update the temporary ball coordinates
         :return:
         """
-        change = Coordinate(cos(self.angle_theta) * (self.length * 1000),
-                            sin(self.angle_theta) * (self.length * 1000))
-
-        self._ball_coords = self.center + change
-        self._ball_coords_opposite = self.center - change
+        change_x = cos(self.angle_theta) * (self.length * 1000)
+        change_y = sin(self.angle_theta) * (self.length * 1000)
+        center = self.center
+        self._ball_coords.set(center.x + change_x, center.y + change_y)
+        self._ball_coords_opposite.set(center.x - change_x, center.y - change_y)
 
     def log(self):
         """
         Log the current state of the elastic band
         :return:
         """
-        self.band_data.data["length [m]"]["data"].append(self.length)
-        self.band_data.data["ball velocity [m/s]"]["data"].append(self.velocity_of_ball)
-        self.band_data.data["ball acceleration [m/s²]"]["data"].append(self.acceleration_of_ball)
-        self.ball_data_1.data["angle [rad]"]["data"].append(self.angle_theta)
-        self.ball_data_1.data["angular velocity [rad/s]"]["data"].append(self.angular_velocity_theta)
-        self.ball_data_1.data["angular acceleration [rad/s²]"]["data"].append(self.angular_acceleration_theta)
-        self.ball_data_1.data["x [m]"]["data"].append(self._ball_coords.x)
-        self.ball_data_1.data["y [m]"]["data"].append(self._ball_coords.y)
-        self.ball_data_2.data["angle [rad]"]["data"].append(self.angle_theta)
-        self.ball_data_2.data["angular velocity [rad/s]"]["data"].append(self.angular_velocity_theta)
-        self.ball_data_2.data["angular acceleration [rad/s²]"]["data"].append(self.angular_acceleration_theta)
-        self.ball_data_2.data["x [m]"]["data"].append(self._ball_coords_opposite.x)
-        self.ball_data_2.data["y [m]"]["data"].append(self._ball_coords_opposite.y)
+        self.store.append_row(self.length, self.velocity_of_ball, self.acceleration_of_ball,
+                              self.angle_theta, self.angular_velocity_theta, self.angular_acceleration_theta,
+                              self._ball_coords.x, self._ball_coords.y,
+                              self._ball_coords_opposite.x, self._ball_coords_opposite.y)
+
+    def state(self) -> Tuple[float, float, float, float, float, float]:
+        """
+        Get the dynamic state of the band
+        :return: Length, velocity, acceleration, angle, angular velocity and angular acceleration
+        """
+        return (self.length, self.velocity_of_ball, self.acceleration_of_ball,
+                self.angle_theta, self.angular_velocity_theta, self.angular_acceleration_theta)
+
+    def restore(self, state: Tuple[float, float, float, float, float, float]):
+        """
+        Continue from a dynamic state
+        :param state: The state (see state())
+        :return:
+        """
+        (self.length, self.velocity_of_ball, self.acceleration_of_ball,
+         self.angle_theta, self.angular_velocity_theta, self.angular_acceleration_theta) = state
+        if self.integrator is not None:
+            self.integrator.reset()
+        self._update_coords()
+
+    def specialize(self, delta_t: float):
+        """
+        Generate the step function advance uses, the constants of the band and delta_t are folded into it
+        (see sim.kernels). Call it again after changing a constant or the integrator
+        :param delta_t: delta time of every step
+        :return:
+        """
+        self.kernel = sim.kernels.generate(self, delta_t)
+
+    def advance(self, n_steps: int):
+        """
+        Simulate a number of ticks of the delta_t passed to specialize, the same as calling physics_tick n_steps times
+        :param n_steps: Number of ticks
+        :return:
+        """
+        self.kernel(self, n_steps)
 
     def physics_tick(self, delta_t: float):
         """
@@ -121,12 +174,16 @@ class ElasticBand(SceneObject):
         :param delta_t: delta time used
         :return:
         """
+        if self.integrator is not None:
+            self.integrator.tick(self, delta_t)
+            return
+
         self.acceleration_of_ball = (
                                             - 1.42 * self.spring_constant  # 2 * spring constant
                                             * max(self.length - self.normal_length, 0)  # delta_l
                                             - 2 * self.ball_mass * sim.constants.g
                                             * (self.friction_coefficient * copysign(1, self.velocity_of_ball))  # - friction
-                                            + (self.angular_velocity_theta ** 2) * self.ball_mass * self.length  # centrifugal force
+                                            + (self.angular_velocity_theta * self.angular_velocity_theta) * self.ball_mass * self.length  # centrifugal force
                                     ) / self.ball_mass  # copy sign of "length_speed" to the current acceleration
         
         self.velocity_of_ball = self.velocity_of_ball + delta_t * self.acceleration_of_ball
@@ -136,7 +193,7 @@ class ElasticBand(SceneObject):
                                                   (-2 * self.ball_torsion_constant) * ((self.angle_theta * self.length) / self.ball_radius)
                                                   - self.ball_roll_friction_constant
                                                   * self.ball_mass * sim.constants.g
-                                          ) / (2 * (self.ball_moment_of_inertia + self.ball_mass * self.length ** 2))
+                                          ) / (2 * (self.ball_moment_of_inertia + self.ball_mass * (self.length * self.length)))
 
         self.angular_velocity_theta = self.angular_velocity_theta + self.angular_acceleration_theta * delta_t
         self.angle_theta = self.angle_theta + self.angular_velocity_theta * delta_t
@@ -147,24 +204,30 @@ class ElasticBand(SceneObject):
         :return:
         """
         self._update_coords()
-        self._scene.circle(self.center, 10, Color(0, 125, 0, alpha=10))
-        self._scene.line(self._ball_coords, self._ball_coords_opposite, Color(255, 255, 255))
-        self._scene.circle(self._ball_coords, self.ball_radius * 1000,
-                           Color(0, 255, 255))  # Conversion from m to cm (px)
-        self._scene.circle(self._ball_coords_opposite, self.ball_radius * 1000, Color(255, 255, 0))
+        points = self._points
+        points[0] = self.center.x, self.center.y
+        points[1] = self._ball_coords.x, self._ball_coords.y
+        points[2] = self._ball_coords_opposite.x, self._ball_coords_opposite.y
+        scene = self._scene
+        center, ball, opposite = scene.to_screen(points, self._screen).tolist()
+        scene.screen_circle(center, 10, CENTER_COLOR)
+        scene.screen_line(ball, opposite, BAND_COLOR)
+        scene.screen_circle(ball, self.ball_radius * 1000, BALL_COLOR)  # Conversion from m to cm (px)
+        scene.screen_circle(opposite, self.ball_radius * 1000, OPPOSITE_BALL_COLOR)
 
     def click(self):
         """
         Check if object was clicked and select it
         """
-        if sim.mouse.mouse().distance(self.center) <= 10:
+        mouse = sim.mouse.mouse()
+        if mouse.distance(self.center) <= 10:
             sim.data.selected = self.band_data
             return
 
-        if sim.mouse.mouse().distance(self._ball_coords) <= self.ball_radius * 500:
+        if mouse.distance(self._ball_coords) <= self.ball_radius * 500:
             sim.data.selected = self.ball_data_1
             return
 
-        if sim.mouse.mouse().distance(self._ball_coords_opposite) <= self.ball_radius * 500:
+        if mouse.distance(self._ball_coords_opposite) <= self.ball_radius * 500:
             sim.data.selected = self.ball_data_2
             return
@@ -0,0 +1,180 @@
+"""
+Assembles the tick of sim.loop from stages. Every stage adds a few lines of code to hooks of the tick, the code of all
+enabled stages is then put together into one function, so a disabled stage costs nothing and the tick contains no
+branches for features that are switched off.
+
+The generated tick looks like this (hooks in brackets):
+
+    def tick():
+        for obj in sim.scene.objects():
+            [before_physics]
+            obj.advance(1)
+            [after_physics]
+            [log]
+            [after_log]
+        sim.iteration += 1
+        [end]
+
+A stage only runs on iterations that are a multiple of its stride (counted before the iteration), a stride of 0 runs
+it on every call of the tick but lets sim.loop.advance skip the iterations in between. The stages run in the order
+they were registered. Stages are registered with a factory that returns None if the stage is disabled, the factories
+are called every time the tick is generated (whenever a scenario is loaded).
+
+Observers can be added from anywhere, for example
+
+    sim.pipeline.probe("energy", lambda: print(band.length), 1000)
+    sim.pipeline.stop_when("torn", lambda: band.length > 0.5)
+    sim.loop.iteration = sim.loop.generate_tick()
+
+The tick only runs in the window process. With "physics_process" enabled the physics process simulates on its own and
+only does what the stages of sim.loop do, other stages are ignored (sim.worker warns about them).
+"""
+from textwrap import indent
+from typing import Callable, Dict, List, Optional, Tuple
+
+import sim
+
+HOOKS = ("before_physics", "after_physics", "log", "after_log")  # Hooks inside the object loop
+Tick = Callable[[], None]
+
+
+class Stage:
+    """
+    A part of the tick
+    """
+    name: str
+    stride: int  # Iterations between two runs of the stage, 0 to run it on every call of the tick
+    code: Dict[str, str]  # Code of every hook it uses (see module documentation)
+    namespace: Dict[str, object]  # Names the code uses besides sim
+
+    def __init__(self, name: str, stride: int, namespace: Dict[str, object] = None, **code: str):
+        """
+        Create a new stage
+        :param name: Name of the stage
+        :param stride: Iterations between two runs of the stage, 0 to run it on every call of the tick
+        :param namespace: Names the code uses besides sim
+        :param code: Code for the hooks, keyword is the name of the hook
+        """
+        self.name = name
+        self.stride = stride
+        self.namespace = namespace or {}
+        self.code = code
+
+
+Factory = Callable[[], Optional[Stage]]
+_factories: Dict[str, Factory] = {}  # Every registered stage by name, in the order they were registered
+
+
+def register(name: str, factory: Factory):
+    """
+    Register a stage, a stage with the same name is replaced. It is used from the next time the tick is generated
+    :param name: Name of the stage
+    :param factory: Creates the stage, returns None if it is disabled
+    :return:
+    """
+    _factories[name] = factory
+
+
+def registered() -> List[str]:
+    """
+    Get the names of all registered stages
+    :return: The names, in the order they were registered
+    """
+    return list(_factories)
+
+
+def unregister(name: str):
+    """
+    Remove a stage. It is gone from the next time the tick is generated
+    :param name: Name of the stage
+    :return:
+    """
+    _factories.pop(name, None)
+
+
+def probe(name: str, function: Callable[[], None], stride: int = 1):
+    """
+    Register a stage that calls a function after every stride-th iteration
+    :param name: Name of the stage
+    :param function: The function to call
+    :param stride: Iterations between two calls
+    :return:
+    """
+    variable = _identifier("probe", name)
+    register(name, lambda: Stage(name, stride, {variable: function}, end=f"{variable}()"))
+
+
+def stop_when(name: str, condition: Callable[[], bool], stride: int = 1):
+    """
+    Register a stage that pauses the simulation as soon as a condition is met
+    :param name: Name of the stage
+    :param condition: Checked after every stride-th iteration
+    :param stride: Iterations between two checks
+    :return:
+    """
+    variable = _identifier("condition", name)
+    register(name, lambda: Stage(name, stride, {variable: condition},
+                                 end=f"if {variable}():\n"
+                                     f"    print({repr('OK Stopped: ' + name)})\n"
+                                     f"    sim.simulate = False\n"
+                                     f"    sim.loop.halt = True"))
+
+
+def _identifier(prefix: str, name: str) -> str:
+    """
+    Create the name of a variable of the tick for a stage
+    :param prefix: What the variable holds
+    :param name: Name of the stage
+    :return: The variable name
+    """
+    return prefix + "_" + "".join(character if character.isalnum() else "_" for character in name)
+
+
+def generate() -> Tuple[Tick, List[int]]:
+    """
+    Put the enabled stages together into a tick
+    :return: The tick and the strides of the stages (without 0)
+    """
+    stages = [stage for stage in (factory() for factory in _factories.values()) if stage is not None]
+    namespace = {"sim": sim}
+    flags = {}  # Variable telling whether stages of a stride run in this iteration
+    for stage in stages:
+        namespace.update(stage.namespace)
+        if stage.stride > 1 and stage.stride not in flags:
+            flags[stage.stride] = f"every_{stage.stride}"
+
+    def hook(name: str, checked: int = 1) -> str:
+        """
+        Collect the code of all stages for a hook
+        :param name: The hook
+        :param checked: Stride that is already known to run in this iteration
+        :return: The code
+        """
+        code = ""
+        for stage in stages:
+            if name not in stage.code:
+                continue
+            if stage.stride not in (0, 1, checked):
+                code += f"if {flags[stage.stride]}:\n" + indent(stage.code[name], "    ") + "\n"
+            else:
+                code += stage.code[name] + "\n"
+        return code
+
+    source = "def tick():\n"
+    for stride, flag in flags.items():
+        source += f"    {flag} = sim.iteration % {stride} == 0\n"
+    sampled = {stage.stride for stage in stages if any(name in stage.code for name in HOOKS)}
+    source += "    for obj in sim.scene.objects():\n"
+    if sampled and min(sampled) > 1:
+        # The object loop has nothing else to do on most iterations
+        checked = min(sampled) if len(sampled) == 1 else 1
+        body = hook(HOOKS[0], checked) + "obj.advance(1)\n" + "".join(hook(name, checked) for name in HOOKS[1:])
+        condition = " or ".join(flags[stride] for stride in sorted(sampled))
+        source += f"        if {condition}:\n" + indent(body, " " * 12) + "        else:\n            obj.advance(1)\n"
+    else:
+        body = hook(HOOKS[0]) + "obj.advance(1)\n" + "".join(hook(name) for name in HOOKS[1:])
+        source += indent(body, " " * 8)
+    source += "    sim.iteration += 1\n" + indent(hook("end"), "    ")
+
+    exec(compile(source, "<tick>", "exec"), namespace)  # skipcq: PYL-W0122
+    return namespace["tick"], sorted({stage.stride for stage in stages if stage.stride})
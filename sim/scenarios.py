@@ -1,22 +1,47 @@
 """
 Handles loading scenarios from json file and setting them up
 """
+from __future__ import annotations
+
 import sys
 
 import sim
 from utils import pool
+from utils.json_file import JsonFile
+
+_file: JsonFile = None  # scenarios.json, opened when it is used for the first time
+
 
-scenarios = pool.open("scenarios.json")
+def __getattr__(name: str):
+    """
+    Open scenarios.json the first time sim.scenarios.scenarios is used, so importing sim reads no files
+    :param name: Name of the attribute
+    :return: The scenarios file
+    """
+    if name == "scenarios":
+        return _scenarios()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _scenarios() -> JsonFile:
+    """
+    Get the scenarios file, it is loaded the first time
+    :return: scenarios.json
+    """
+    global _file  # skipcq: PYL-W0603 - the file is only opened once
+    if _file is None:
+        _file = pool.open("scenarios.json")
+    return _file
 
 
 def init():
     """
     Initialize scenarios and check for errors
     """
-    if len(scenarios.json) == 0:
+    if len(_scenarios().json) == 0:
         print("! No scenarios defined!")
         sys.exit()
-    if scenarios.json["selected"] >= len(scenarios.json["scenarios"]):
+    if _scenarios().json["selected"] >= len(_scenarios().json["scenarios"]):
         print("! Selected scenario not defined!")
         sys.exit()
     load_current()
@@ -26,21 +51,52 @@ def load_current():
     """
     Load the current scenario
     """
-    scenario = scenarios.json["scenarios"][scenarios.json["selected"]]
-    sim.loop.every = scenario["simulation"]["render_every"]
+    scenario = _scenarios().json["scenarios"][_scenarios().json["selected"]]
+    sim.loop.fps = scenario["simulation"].get("fps", 60)
     sim.loop.delta_t = scenario["simulation"]["delta_t"]
     sim.loop.log_every = scenario["simulation"]["log_every"]
     sim.loop.iteration = sim.loop.generate_tick()
-    sim.objects.ElasticBand(sim.scene,
-                            scenario["setup"]["start"]["band_length"], scenario["setup"]["band"]["length"],
-                            scenario["setup"]["start"]["alpha"], sim.scene.middle(),
-                            scenario["setup"]["band"]["spring_constant"],
-                            scenario["setup"]["balls"]["friction_constant"],
-                            scenario["setup"]["balls"]["mass"], scenario["setup"]["balls"]["radius"],
-                            scenario["setup"]["balls"]["torsion_constant"],
-                            scenario["setup"]["balls"]["roll_friction_constant"],
-                            "elastic band")
-    print("OK Loaded scenario " + str(scenarios.json["selected"]))
+    configure_storage(scenario)
+    sim.data.realtime = sim.storage.column()
+    sim.data.perf_time = sim.storage.column()
+    band = create_band(sim.scene, scenario, sim.scene.middle())
+    if sim.worker.current is not None:
+        sim.worker.current.load(scenario, band, not sim.loop.disable_log, not sim.loop.maxperf)
+    sim.checkpoint.load(selected(), scenario, band)
+    print("OK Loaded scenario " + str(_scenarios().json["selected"]))
+
+
+def configure_storage(scenario: dict):
+    """
+    Select the kind of log storage a scenario wants (see sim.storage)
+    :param scenario: The scenario (one entry of the "scenarios" list)
+    """
+    sim.storage.mode = scenario["simulation"].get("log_mode", "full")
+    sim.storage.capacity = scenario["simulation"].get("log_capacity", 100000)
+    sim.storage.directory = scenario["simulation"].get("log_directory", "logs")
+
+
+def create_band(scene: sim.scene_objects.Scene, scenario: dict, center: sim.scene_objects.Coordinate,
+                store: sim.storage.ColumnStore = None) -> sim.objects.ElasticBand:
+    """
+    Create the elastic band described by a scenario
+    :param scene: Scene to add the band to
+    :param scenario: The scenario (one entry of the "scenarios" list)
+    :param center: Center of rotation of the band
+    :param store: Store to log into, defaults to a new store of the kind selected in sim.storage
+    :return: The new elastic band, specialized for the delta_t of the scenario
+    """
+    band = sim.objects.ElasticBand(scene,
+                                   scenario["setup"]["start"]["band_length"], scenario["setup"]["band"]["length"],
+                                   scenario["setup"]["start"]["alpha"], center,
+                                   scenario["setup"]["band"]["spring_constant"],
+                                   scenario["setup"]["balls"]["friction_constant"],
+                                   scenario["setup"]["balls"]["mass"], scenario["setup"]["balls"]["radius"],
+                                   scenario["setup"]["balls"]["torsion_constant"],
+                                   scenario["setup"]["balls"]["roll_friction_constant"],
+                                   "elastic band", sim.integrators.create(scenario["simulation"]), store)
+    band.specialize(scenario["simulation"]["delta_t"])
+    return band
 
 
 def reset():
@@ -51,9 +107,7 @@ def reset():
     sim.iteration = 0
     sim.simulate = False
     sim.data.selected = None
-    sim.data.realtime = []
     sim.loop.realtime = 0
-    sim.data.perf_time.clear()
     print("OK Reset")
     load_current()
     sim.loop.screen()
@@ -63,8 +117,8 @@ def next_scenario():
     """
     Switch to next scenario
     """
-    if scenarios.json["selected"] + 1 < len(scenarios.json["scenarios"]):
-        scenarios.json["selected"] += 1
+    if _scenarios().json["selected"] + 1 < len(_scenarios().json["scenarios"]):
+        _scenarios().json["selected"] += 1
         reset()
 
 
@@ -72,8 +126,8 @@ def prev_scenario():
     """
     Switch to previous scenario
     """
-    if scenarios.json["selected"] >= 1:
-        scenarios.json["selected"] -= 1
+    if _scenarios().json["selected"] >= 1:
+        _scenarios().json["selected"] -= 1
         reset()
 
 
@@ -82,8 +136,8 @@ def reload():
     Reload the json file from storage and reset
     """
     prev_selected = selected()
-    scenarios.reload()
-    scenarios.json["selected"] = prev_selected
+    _scenarios().reload()
+    _scenarios().json["selected"] = prev_selected
     reset()
     print("OK Reloaded all scenarios")
 
@@ -92,4 +146,4 @@ def selected() -> int:
     """
     Get the selected scenario
     """
-    return scenarios.json["selected"]
+    return _scenarios().json["selected"]
@@ -4,11 +4,15 @@ Basic scene utility classes
 from __future__ import annotations
 
 import math
-from typing import List, Tuple, Dict, Union
+from typing import List, Tuple, Dict, Union, TYPE_CHECKING
 
-import pygame
+import numpy as np
 
 import sim
+from sim.storage import Column
+
+if TYPE_CHECKING:
+    import pygame
 
 
 class SceneObject:
@@ -31,6 +35,13 @@ class SceneObject:
         :return:
         """
 
+    def advance(self, n_steps: int):
+        """
+        Executed instead of n_steps physics ticks of the delta_t of the scenario
+        :param n_steps: number of physics ticks
+        :return:
+        """
+
     def draw(self):
         """
         Draws the object onto a given scene
@@ -62,13 +73,13 @@ class DataObject:
     """
 
     name: str
-    data: Dict[str, Dict[str, Union[bool, List[float]]]]
+    data: Dict[str, Dict[str, Union[bool, Column]]]
 
-    def __init__(self, name: str, data: Dict[str, Dict[str, Union[bool, List[float]]]]):
+    def __init__(self, name: str, data: Dict[str, Dict[str, Union[bool, Column]]]):
         """
         Initialize the data object
         :param name: Name of the dataobject
-        :param data: Initial data structure
+        :param data: Initial data structure ({plot name: {"data": column of a ColumnStore, "export": bool}})
         """
         self.data = data
         self.name = name
@@ -80,18 +91,22 @@ class Scene:
     """
 
     __display: pygame.Surface
-    __objects: List[SceneObject] = []
+    __objects: List[SceneObject]
+    __drawn: List[pygame.Rect]  # Areas the objects were drawn to in the last frame
     corner: Coordinate
-    data: List[DataObject] = []
+    data: List[DataObject]
     height: int
     width: int
 
-    def __init__(self, display: pygame.Surface, corner: Coordinate, width: int, height: int):
+    def __init__(self, display: Union[pygame.Surface, None], corner: Coordinate, width: int, height: int):
         """
         Create a new scene
-        :param display: display to draw objects to
+        :param display: display to draw objects to, None for a scene that is never drawn (headless)
         """
         self.__display: pygame.Surface = display
+        self.__objects = []
+        self.__drawn = []
+        self.data = []
         self.height = height
         self.width = width
         self.corner = corner
@@ -111,14 +126,22 @@ class Scene:
         """
         self.__objects.append(obj)
 
-    def draw_all(self):
+    def draw_all(self) -> List[pygame.Rect]:
         """
-        Redraw all objects
-        :return:
+        Redraw all objects. Only the areas the objects were drawn to in the last frame are cleared, objects are never
+        drawn outside the scene
+        :return: The areas of the display that changed
         """
-        self.__display.fill((0, 0, 0))
+        cleared = self.__drawn
+        for rect in cleared:
+            self.__display.blit(sim.window.background, rect, rect)
+        self.__drawn = []
+        top = sim.window.height - self.corner.y - self.height  # y is inverted
+        self.__display.set_clip((self.corner.x, top, self.width, self.height))
         for drawable in self.__objects:
             drawable.draw()
+        self.__display.set_clip(None)
+        return cleared + self.__drawn
 
     def line(self, source: Coordinate, destination: Coordinate, color: Color):
         """
@@ -128,8 +151,10 @@ class Scene:
         :param color: Color of line
         :return:
         """
-        pygame.draw.line(self.__display, color.tuple(), (self.corner + source).true_coordinates(),
-                         (self.corner + destination).true_coordinates())
+        corner = self.corner
+        height = sim.window.height
+        self.screen_line((corner.x + source.x, height - (corner.y + source.y)),
+                         (corner.x + destination.x, height - (corner.y + destination.y)), color)
 
     def circle(self, location: Coordinate, radius: float, color: Color):
         """
@@ -139,7 +164,42 @@ class Scene:
         :param color: Color of circle
         :return:
         """
-        pygame.draw.circle(self.__display, color.tuple(), (self.corner + location).true_coordinates(), radius)
+        corner = self.corner
+        self.screen_circle((corner.x + location.x, sim.window.height - (corner.y + location.y)), radius, color)
+
+    def screen_line(self, source: Tuple[float, float], destination: Tuple[float, float], color: Color):
+        """
+        Draw a line between two points in window coordinates (see to_screen)
+        :param source: Where to draw from
+        :param destination: Where to draw to
+        :param color: Color of line
+        :return:
+        """
+        import pygame.draw  # skipcq: PYL-C0415 - pygame is only loaded when there is a window (see sim.headless)
+        self.__drawn.append(pygame.draw.line(self.__display, color.tuple(), source, destination))
+
+    def screen_circle(self, location: Tuple[float, float], radius: float, color: Color):
+        """
+        Draw a circle around a point in window coordinates (see to_screen)
+        :param location: Where to draw
+        :param radius: Radius of circle
+        :param color: Color of circle
+        :return:
+        """
+        import pygame.draw  # skipcq: PYL-C0415 - pygame is only loaded when there is a window (see sim.headless)
+        self.__drawn.append(pygame.draw.circle(self.__display, color.tuple(), location, radius))
+
+    def to_screen(self, points: np.ndarray, out: np.ndarray = None) -> np.ndarray:
+        """
+        Transform many points of the scene into window coordinates at once (the same as true_coordinates of every
+        point), for objects that draw several points
+        :param points: The points, one row of x and y each
+        :param out: Array of the same shape to write the window coordinates into, a new one if None
+        :return: The window coordinates, one row each
+        """
+        screen = np.add(points, (self.corner.x, self.corner.y), out=out)
+        np.subtract(sim.window.height, screen[:, 1], out=screen[:, 1])
+        return screen
 
     def text(self, location: Coordinate, text: str, color: Color, background: Color = None):
         """
@@ -150,10 +210,9 @@ class Scene:
         :param background: Background of text. None is no background
         :return:
         """
-        rendered = sim.font.small_font.render(text, True, color.tuple(), background)
-        rect = rendered.get_rect()
-        rect.center = (self.corner + location).true_coordinates()
-        self.__display.blit(rendered, rect)
+        self.__drawn.append(sim.font.blit(self.__display, text, color.tuple(),
+                                          background.tuple() if background is not None else None,
+                                          center=(self.corner + location).true_coordinates()))
 
     def objects(self) -> List[SceneObject]:
         """
@@ -173,12 +232,14 @@ class Scene:
 
 class Color:
     """
-    A drawable color
+    A drawable color. Colors never change, create a new one instead
     """
+    __slots__ = ("r", "g", "b", "alpha", "_tuple")
     r: int
     g: int
     b: int
     alpha: int
+    _tuple: Tuple[int, int, int, int]
 
     def __init__(self, r: int, g: int, b: int, alpha: int = 255):
         """
@@ -191,13 +252,14 @@ class Color:
         self.r: int = r
         self.g: int = g
         self.b: int = b
+        self._tuple = (r, g, b, alpha)
 
     def tuple(self) -> Tuple[int, int, int, int]:
         """
         Create a tuple for using colors in pygame
-        :return: A tuple of all the values (r, g, b)
+        :return: A tuple of all the values (r, g, b, alpha)
         """
-        return self.r, self.g, self.b, self.alpha
+        return self._tuple
 
     def __invert__(self):
         """
@@ -209,9 +271,9 @@ class Color:
 
 class Coordinate:
     """
-    A coordinate on the window
+    A coordinate on the window. The operators create new coordinates, set changes one in place
     """
-
+    __slots__ = ("x", "y")
     x: float
     y: float
 
@@ -224,6 +286,17 @@ class Coordinate:
         self.x: float = x
         self.y: float = y
 
+    def set(self, x: float, y: float) -> Coordinate:
+        """
+        Move the coordinate, without creating a new one
+        :param x: New x value
+        :param y: New y value
+        :return: The coordinate
+        """
+        self.x = x
+        self.y = y
+        return self
+
     def __truediv__(self, other: float):
         """
         Divide all the components by a single number
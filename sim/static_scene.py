@@ -1,47 +1,70 @@
 """
 "Static content" to draw to every frame
 """
-from typing import List, Tuple
+from typing import List
 
-from pygame import Surface
+import pygame
 
 import sim.window
+from utils import git
 
-_texts: List[Tuple[Surface, Surface]] = []
+_drawn: List[pygame.Rect] = []  # Areas the texts were drawn to in the last frame
 
 
 def init():
     """
-    Fill the texts array
+    Draw everything that never changes onto the background
     :return:
     """
-    rendered = sim.font.small_font.render(
-        "SPACE to simulate | ESC to quit | CLICK to select | E to export data to excel | -> next scenario | <- prev scenario | L reload scenarios from disk",
-        True, (200, 200, 200), (0, 0, 0))
+    sim.window.background.fill((0, 0, 0))
+    rendered = sim.font.render(
+        "SPACE to simulate | ESC to quit | CLICK to select | E to export data to excel | -> next scenario | <- prev scenario | L reload scenarios from disk | K checkpoint | B rewind | F resume | T timers",
+        (200, 200, 200))
     rect = rendered.get_rect()
     rect.center = (rendered.get_rect().size[0] // 2, sim.window.height - rendered.get_rect().size[1] // 2)
-    _texts.append((rendered, rect))
+    sim.window.background.blit(rendered, rect)
+    # Border of the object inspector
+    pygame.draw.line(sim.window.background, (255, 255, 255), (sim.data.corner.x, sim.data.corner.y),
+                     (sim.data.corner.x, sim.window.height), width=10)
 
 
-def apply():
+def clear() -> List[pygame.Rect]:
+    """
+    Remove the texts of the last frame
+    :return: The areas of the display that changed
+    """
+    global _drawn  # skipcq: PYL-W0603 - the texts are removed in the next frame
+    cleared = _drawn
+    for rect in cleared:
+        sim.window.pygame_scene.blit(sim.window.background, rect, rect)
+    _drawn = []
+    return cleared
+
+
+def apply() -> List[pygame.Rect]:
     """
     Render all the texts onto the scene
-    :return:
+    :return: The areas of the display that changed
     """
-    for text in _texts:
-        sim.window.pygame_scene.blit(*text)
-    rendered = sim.font.small_font.render("iteration " + str(sim.iteration), True, (81, 81, 81), (0, 0, 0))
-    rect = rendered.get_rect()
-    rect.center = (sim.scene.width - rendered.get_rect().size[0] // 2 - 5, rendered.get_rect().size[1] // 2)
-    sim.window.pygame_scene.blit(rendered, rect)
-    rendered = sim.font.small_font.render("real time: " + str(round(sim.loop.realtime, 3)) + "s", True, (255, 255, 255),
-                                          (0, 0, 0))
-    rect = rendered.get_rect()
-    rect.center = (rendered.get_rect().size[0] // 2, rendered.get_rect().size[1] // 2)
-    sim.window.pygame_scene.blit(rendered, rect)
-    rendered = sim.font.small_font.render(f"scenario {sim.scenarios.selected()}; 1p = 1cm; ballz v{sim.VERSION} :)",
-                                          True, (81, 81, 81), (0, 0, 0))
+    scene = sim.window.pygame_scene
+    _drawn.append(sim.font.blit(scene, "iteration " + str(sim.iteration), (81, 81, 81),
+                                topright=(sim.scene.width - 5, 0)))
+    status = sim.export.status()
+    if status:
+        _drawn.append(sim.font.blit(scene, status, (200, 200, 200),
+                                    topright=(sim.scene.width - 5, sim.font.small_font.get_height())))
+    if git.available.is_set():
+        _drawn.append(sim.font.blit(scene, "new version available | U to update and restart", (200, 200, 200),
+                                    topright=(sim.scene.width - 5, sim.font.small_font.get_height() * 2)))
+    _drawn.append(sim.font.blit(scene, "real time: " + str(round(sim.loop.realtime, 3)) + "s", (255, 255, 255),
+                                topleft=(0, 0)))
+    if sim.timers.overlay:
+        # Below the real time
+        height = sim.font.small_font.get_linesize()
+        for line, text in enumerate(sim.timers.lines(), start=1):
+            _drawn.append(sim.font.blit(scene, text, (200, 200, 200), topleft=(0, line * height)))
+    rendered = sim.font.render(f"scenario {sim.scenarios.selected()}; 1p = 1cm; ballz v{sim.VERSION} :)", (81, 81, 81))
     rect = rendered.get_rect()
-    rect.center = (
-        sim.scene.width - rendered.get_rect().size[0] // 2 - 5, sim.window.height - rendered.get_rect().size[1] // 2)
-    sim.window.pygame_scene.blit(rendered, rect)
+    rect.bottomright = (sim.scene.width - 5, sim.window.height)
+    _drawn.append(scene.blit(rendered, rect))
+    return _drawn
@@ -0,0 +1,646 @@
+"""
+Columnar storage for logged data. Samples are kept as float64 in numpy arrays (8 bytes per sample instead of a
+boxed python float in a list) and rows are appended in blocks. Every column keeps running Statistics and can keep
+Windows over its last samples, both are updated whenever a block is written, so they never need a pass over all data.
+
+The "log_mode" of a scenario selects the kind of store:
+    "full"    keep every sample (default)
+    "minmax"  keep at most "log_capacity" points per column, see EnvelopeStore
+    "disk"    keep every sample in memory mapped files in "log_directory", see DiskStore
+"""
+from __future__ import annotations
+
+import os
+import sys
+import tempfile
+from collections import deque
+from itertools import chain
+from typing import BinaryIO, Deque, Dict, Iterator, List, Tuple
+
+import numpy as np
+
+block_size = 4096  # Rows collected before they are written into the columns
+growth = 1.25  # Factor the capacity of a column grows by when it is full
+mode = "full"  # Kind of store created by store()
+capacity = 100000  # Points per column kept by an EnvelopeStore
+directory = "logs"  # Directory of the files of a DiskStore
+disk_chunk = 1 << 20  # Samples a DiskColumn file holds at first
+
+
+class Statistics:
+    """
+    Minimum, maximum and mean of every sample ever added to a column, updated block by block when the samples are
+    written (also for stores that do not keep every sample)
+    """
+    count: int
+    minimum: float
+    maximum: float
+    total: float
+
+    def __init__(self):
+        """
+        Create statistics without any samples
+        """
+        self.count = 0
+        self.minimum = float("inf")
+        self.maximum = float("-inf")
+        self.total = 0.0
+
+    def add(self, values: np.ndarray):
+        """
+        Include new samples
+        :param values: The samples
+        :return:
+        """
+        if len(values) == 0:
+            return
+        self.count += len(values)
+        self.minimum = min(self.minimum, float(values.min()))
+        self.maximum = max(self.maximum, float(values.max()))
+        self.total += float(values.sum())
+
+    @property
+    def mean(self) -> float:
+        """
+        Mean of all samples, nan without samples
+        """
+        return self.total / self.count if self.count else float("nan")
+
+    @property
+    def peak(self) -> float:
+        """
+        Largest absolute value of all samples, 0 without samples
+        """
+        return max(abs(self.minimum), abs(self.maximum)) if self.count else 0.0
+
+
+class Window:
+    """
+    Minimum and maximum of the last samples of a column. Both are kept in monotonic deques, so adding a sample takes
+    amortized constant time and reading them constant time
+    """
+    size: int  # Number of samples in the window
+    _added: int  # Number of samples added so far
+    _minima: Deque[Tuple[int, float]]  # (index, value), increasing values, the first is the minimum
+    _maxima: Deque[Tuple[int, float]]  # (index, value), decreasing values, the first is the maximum
+
+    def __init__(self, size: int):
+        """
+        Create an empty window
+        :param size: Number of samples in the window
+        """
+        self.size = size
+        self._added = 0
+        self._minima = deque()
+        self._maxima = deque()
+
+    def add(self, values: np.ndarray):
+        """
+        Move the window over new samples
+        :param values: The samples
+        :return:
+        """
+        if len(values) == 0:
+            return
+        if len(values) >= self.size:
+            # All old samples leave the window
+            self._added += len(values) - self.size
+            self._minima.clear()
+            self._maxima.clear()
+            values = values[-self.size:]
+        minima, maxima = self._minima, self._maxima
+        index = self._added
+        for value in values.tolist():
+            while minima and minima[-1][1] >= value:
+                minima.pop()
+            minima.append((index, value))
+            while maxima and maxima[-1][1] <= value:
+                maxima.pop()
+            maxima.append((index, value))
+            index += 1
+        self._added = index
+        first = index - self.size
+        while minima[0][0] < first:
+            minima.popleft()
+        while maxima[0][0] < first:
+            maxima.popleft()
+
+    @property
+    def minimum(self) -> float:
+        """
+        Smallest sample in the window, nan without samples
+        """
+        return self._minima[0][1] if self._minima else float("nan")
+
+    @property
+    def maximum(self) -> float:
+        """
+        Largest sample in the window, nan without samples
+        """
+        return self._maxima[0][1] if self._maxima else float("nan")
+
+    @property
+    def peak(self) -> float:
+        """
+        Largest absolute value in the window, 0 without samples
+        """
+        return max(abs(self.minimum), abs(self.maximum)) if self._minima else 0.0
+
+
+class Column:
+    """
+    A growing column of float64 samples, part of a ColumnStore. It behaves like a read only sequence and
+    view() returns the samples as a numpy array without copying them
+    """
+    statistics: Statistics  # Statistics of all samples ever added
+    _store: ColumnStore
+    _values: np.ndarray  # Storage, only the first _length entries are used
+    _length: int
+    _windows: Dict[int, Window]  # Windows over the last samples by size
+
+    def __init__(self, store: ColumnStore):
+        """
+        Create a new empty column
+        :param store: Store the column belongs to
+        """
+        self.statistics = Statistics()
+        self._store = store
+        self._values = np.empty(block_size)
+        self._length = 0
+        self._windows = {}
+
+    def view(self) -> np.ndarray:
+        """
+        Get all samples without copying them. The view is only valid until the next sample is appended
+        :return: All samples
+        """
+        if self._store.pending:
+            self._store.flush()
+        return self._values[:self._length]
+
+    def snapshot(self) -> np.ndarray:
+        """
+        Get all samples as an array that does not change anymore, even if more samples are appended
+        :return: All samples
+        """
+        values = self.view()
+        # Appending never changes the samples that are already stored in a normal store, a view is enough
+        return values if self.append_only else values.copy()
+
+    @property
+    def append_only(self) -> bool:
+        """
+        Whether stored samples never change, only new ones are appended
+        """
+        return self._store.append_only
+
+    def window(self, size: int) -> Window:
+        """
+        Get a window over the last samples that is kept up to date while samples are appended (only for append only
+        columns, the samples of other columns change in place)
+        :param size: Number of samples in the window
+        :return: The window
+        """
+        if size not in self._windows:
+            window = Window(size)
+            window.add(self.view()[-size:])
+            self._windows[size] = window
+        return self._windows[size]
+
+    def append(self, value: float):
+        """
+        Append a sample (only for columns of a store with a single column)
+        :param value: The sample
+        :return:
+        """
+        self._store.append_row(value)
+
+    def extend(self, values: np.ndarray):
+        """
+        Append many samples at once (only for columns of a store with a single column)
+        :param values: The samples
+        :return:
+        """
+        self._store.extend(values.reshape(-1, 1))
+
+    def _extend(self, values, count: int):
+        """
+        Write samples to the end of the column
+        :param values: Iterable or array of samples
+        :param count: Number of samples
+        :return:
+        """
+        end = self._length + count
+        if end > len(self._values):
+            self._grow(max(end, int(len(self._values) * growth)))
+        if isinstance(values, np.ndarray):
+            self._values[self._length:end] = values
+        else:
+            self._values[self._length:end] = np.fromiter(values, np.float64, count)
+        added = self._values[self._length:end]
+        self._length = end
+        self.statistics.add(added)
+        for window in self._windows.values():
+            window.add(added)
+
+    def truncate(self, length: int):
+        """
+        Remove all samples after the first ones (only for columns of a store with a single column)
+        :param length: Number of samples to keep
+        :return:
+        """
+        self._store.truncate(length)
+
+    def _grow(self, size: int):
+        """
+        Make room for more samples
+        :param size: Number of samples the column needs to hold
+        :return:
+        """
+        grown = np.empty(size)
+        grown[:self._length] = self._values[:self._length]
+        self._values = grown
+
+    def _truncate(self, length: int):
+        """
+        Remove all samples after the first ones and calculate the statistics and windows again
+        :param length: Number of samples to keep
+        :return:
+        """
+        self._length = min(self._length, length)
+        self._detach()
+        values = self._values[:self._length]
+        self.statistics = Statistics()
+        self.statistics.add(values)
+        for size in self._windows:
+            self._windows[size] = Window(size)
+            self._windows[size].add(values[-size:])
+
+    def _detach(self):
+        """
+        Move the samples into new storage, snapshots taken before (e.g. by a running export) keep the old samples
+        instead of being overwritten by the samples appended after a truncation
+        :return:
+        """
+        self._values = self._values.copy()
+
+    def __len__(self) -> int:
+        return len(self.view())
+
+    def __getitem__(self, item):
+        return self.view()[item]
+
+    def __iter__(self) -> Iterator[float]:
+        """
+        Iterate over all samples as python floats, converting one block at a time
+        """
+        values = self.view()
+        for start in range(0, len(values), block_size):
+            yield from values[start:start + block_size].tolist()
+
+
+class ColumnStore:
+    """
+    A table of float64 columns that grows by one row at a time
+    """
+    columns: List[Column]
+    pending: List[tuple]  # Rows that have not been written into the columns yet
+    append_only = True  # Stored samples never change
+    column_class = Column
+
+    def __init__(self, size: int):
+        """
+        Create a new empty store
+        :param size: Number of columns
+        """
+        self.columns = [self.column_class(self) for _ in range(size)]
+        self.pending = []
+
+    def append_row(self, *values: float):
+        """
+        Append one row, rows are buffered and written into the columns block by block
+        :param values: One value per column
+        :return:
+        """
+        pending = self.pending
+        pending.append(values)
+        if len(pending) >= block_size:
+            self.flush()
+
+    def extend(self, rows: np.ndarray):
+        """
+        Append many rows at once
+        :param rows: Array of shape (rows, columns)
+        :return:
+        """
+        self.flush()
+        for column, values in zip(self.columns, rows.T):
+            column._extend(values, len(values))  # skipcq: PYL-W0212 - columns are part of the store
+
+    def flush(self):
+        """
+        Write all buffered rows into the columns
+        :return:
+        """
+        rows = self.pending
+        if not rows:
+            return
+        self.pending = []
+        for column, values in zip(self.columns, zip(*rows)):
+            column._extend(values, len(rows))  # skipcq: PYL-W0212 - columns are part of the store
+
+    def truncate(self, rows: int):
+        """
+        Remove all rows after the first ones
+        :param rows: Number of rows to keep
+        :return:
+        """
+        self.flush()
+        for column in self.columns:
+            column._truncate(rows)  # skipcq: PYL-W0212 - columns are part of the store
+
+    def __len__(self) -> int:
+        return len(self.columns[0]) if self.columns else 0
+
+
+class DiskColumn(Column):
+    """
+    A column kept in a memory mapped temporary file in the log directory. Only the pages that are used are in memory
+    and the operating system can write them back to the file at any time, so a column can be larger than the memory.
+    Views are views of the file. The file is deleted when the column is not used anymore
+    """
+    _file: BinaryIO
+
+    def __init__(self, store: ColumnStore):
+        """
+        Create a new empty column
+        :param store: Store the column belongs to
+        """
+        super().__init__(store)
+        os.makedirs(store.directory, exist_ok=True)
+        self._file = tempfile.TemporaryFile(prefix="ballz_log_", suffix=".f64", dir=store.directory)
+        self._grow(disk_chunk)
+
+    def _grow(self, size: int):
+        """
+        Make the file larger and map it again, the samples already stored stay where they are
+        :param size: Number of samples the column needs to hold
+        :return:
+        """
+        size = max(size, len(self._values) * 2)
+        self._file.truncate(size * 8)
+        # Views of the old mapping stay valid, the file only grows
+        self._values = np.memmap(self._file, np.float64, "r+", shape=(size,))
+
+    def _detach(self):
+        """
+        Move the samples into a new file, snapshots taken before keep the mapping of the old one
+        :return:
+        """
+        kept = self._values[:self._length]
+        self._file = tempfile.TemporaryFile(prefix="ballz_log_", suffix=".f64", dir=self._store.directory)
+        self._values = np.empty(0)
+        self._grow(max(disk_chunk, self._length))
+        self._values[:self._length] = kept
+
+
+class DiskStore(ColumnStore):
+    """
+    A store of columns in memory mapped files (see DiskColumn), only the rows that have not been written yet are
+    kept in memory
+    """
+    column_class = DiskColumn
+    directory: str  # Directory of the files
+
+    def __init__(self, size: int, files: str = None):
+        """
+        Create a new empty store
+        :param size: Number of columns
+        :param files: Directory of the files, defaults to the module setting
+        """
+        self.directory = files if files is not None else directory
+        super().__init__(size)
+
+
+class EnvelopeStore(ColumnStore):
+    """
+    A store with bounded memory for arbitrarily long runs. Rows are grouped into buckets and every bucket is stored
+    as two points per column, its minimum and maximum in the order they occurred, so oscillation peaks are never
+    lost. When all points are used, neighbouring buckets are merged and the bucket size doubles. The last point pair
+    is the (still growing) current bucket.
+    Stores with the same capacity that get the same number of rows always have the same bucket boundaries, so their
+    columns stay aligned (e.g. with the real time column).
+    """
+    append_only = False  # Buckets are merged in place
+    buckets: int  # Number of complete buckets
+    bucket_size: int  # Rows per complete bucket
+    _max_buckets: int
+    _tail_count: int  # Rows in the current bucket
+    _tail_min: np.ndarray
+    _tail_max: np.ndarray
+    _tail_min_at: np.ndarray  # Row of the minimum inside the current bucket
+    _tail_max_at: np.ndarray
+
+    def __init__(self, size: int, points: int):
+        """
+        Create a new empty store
+        :param size: Number of columns
+        :param points: Maximum number of points per column
+        """
+        super().__init__(size)
+        self._max_buckets = max(2, points // 4 * 2)  # An even number of buckets, so they can be merged in pairs
+        self.buckets = 0
+        self.bucket_size = 1
+        self._tail_count = 0
+        self._tail_min = np.empty(size)
+        self._tail_max = np.empty(size)
+        self._tail_min_at = np.zeros(size, dtype=np.int64)
+        self._tail_max_at = np.zeros(size, dtype=np.int64)
+        for column in self.columns:
+            column._values = np.empty(self._max_buckets * 2 + 2)  # skipcq: PYL-W0212 - columns are part of the store
+
+    def extend(self, rows: np.ndarray):
+        """
+        Append many rows at once
+        :param rows: Array of shape (rows, columns)
+        :return:
+        """
+        self.flush()
+        self._add_statistics(rows)
+        self._reduce(rows)
+
+    def flush(self):
+        """
+        Reduce all buffered rows into the buckets
+        :return:
+        """
+        rows = self.pending
+        if not rows:
+            return
+        self.pending = []
+        size = len(self.columns)
+        rows = np.fromiter(chain.from_iterable(rows), np.float64, len(rows) * size).reshape(len(rows), size)
+        self._add_statistics(rows)
+        self._reduce(rows)
+
+    def truncate(self, rows: int):
+        """
+        Remove all rows. Rows can not be taken out of the buckets again, so every row is removed, whatever rows is
+        :param rows: Ignored
+        :return:
+        """
+        self.pending = []
+        self.buckets = 0
+        self.bucket_size = 1
+        self._tail_count = 0
+        for column in self.columns:
+            column._truncate(0)  # skipcq: PYL-W0212 - columns are part of the store
+
+    def _add_statistics(self, rows: np.ndarray):
+        """
+        Include rows in the statistics of the columns, before they are reduced
+        :param rows: Array of shape (rows, columns)
+        :return:
+        """
+        for index, column in enumerate(self.columns):
+            column.statistics.add(rows[:, index])
+
+    def _reduce(self, rows: np.ndarray):
+        """
+        Add rows to the buckets
+        :param rows: Array of shape (rows, columns)
+        :return:
+        """
+        index = 0
+        while index < len(rows):
+            free = self._max_buckets - self.buckets
+            if self._tail_count == 0 and len(rows) - index >= self.bucket_size:
+                # Whole buckets at once
+                count = min((len(rows) - index) // self.bucket_size, free)
+                groups = rows[index:index + count * self.bucket_size].reshape(count, self.bucket_size, -1)
+                self._store_pairs(*self._envelope(groups))
+                index += count * self.bucket_size
+            else:
+                take = min(self.bucket_size - self._tail_count, len(rows) - index)
+                self._add_to_tail(rows[index:index + take])
+                index += take
+                if self._tail_count == self.bucket_size:
+                    first, second = self._tail_pair()
+                    self._store_pairs(first[np.newaxis], second[np.newaxis])
+                    self._tail_count = 0
+            if self.buckets == self._max_buckets:
+                self._merge()
+        # Show the current bucket after the complete ones
+        visible = self.buckets * 2
+        if self._tail_count:
+            first, second = self._tail_pair()
+            for column, first_value, second_value in zip(self.columns, first, second):
+                column._values[visible] = first_value  # skipcq: PYL-W0212 - columns are part of the store
+                column._values[visible + 1] = second_value  # skipcq: PYL-W0212
+            visible += 2
+        for column in self.columns:
+            column._length = visible  # skipcq: PYL-W0212 - columns are part of the store
+
+    @staticmethod
+    def _envelope(groups: np.ndarray):
+        """
+        Get the minimum and maximum of groups of rows in the order they occurred
+        :param groups: Array of shape (groups, rows per group, columns)
+        :return: The first and the second point of every group, arrays of shape (groups, columns)
+        """
+        minimum_at = groups.argmin(axis=1)
+        maximum_at = groups.argmax(axis=1)
+        minimum = np.take_along_axis(groups, minimum_at[:, np.newaxis, :], axis=1)[:, 0, :]
+        maximum = np.take_along_axis(groups, maximum_at[:, np.newaxis, :], axis=1)[:, 0, :]
+        minimum_first = minimum_at <= maximum_at
+        return np.where(minimum_first, minimum, maximum), np.where(minimum_first, maximum, minimum)
+
+    def _store_pairs(self, first: np.ndarray, second: np.ndarray):
+        """
+        Store complete buckets
+        :param first: First point of every bucket, shape (buckets, columns)
+        :param second: Second point of every bucket, shape (buckets, columns)
+        :return:
+        """
+        start = self.buckets * 2
+        end = start + len(first) * 2
+        for index, column in enumerate(self.columns):
+            values = column._values  # skipcq: PYL-W0212 - columns are part of the store
+            values[start:end:2] = first[:, index]
+            values[start + 1:end:2] = second[:, index]
+        self.buckets += len(first)
+
+    def _merge(self):
+        """
+        Merge neighbouring buckets, halving the number of buckets and doubling the bucket size
+        :return:
+        """
+        points = np.stack([column._values[:self.buckets * 2] for column in self.columns],  # skipcq: PYL-W0212
+                          axis=1)
+        self.buckets = 0
+        self._store_pairs(*self._envelope(points.reshape(-1, 4, len(self.columns))))
+        self.bucket_size *= 2
+
+    def _add_to_tail(self, rows: np.ndarray):
+        """
+        Add rows to the current bucket
+        :param rows: Array of shape (rows, columns)
+        :return:
+        """
+        minimum_at = rows.argmin(axis=0)
+        maximum_at = rows.argmax(axis=0)
+        columns = np.arange(rows.shape[1])
+        minimum = rows[minimum_at, columns]
+        maximum = rows[maximum_at, columns]
+        if self._tail_count == 0:
+            self._tail_min, self._tail_max = minimum, maximum
+            self._tail_min_at, self._tail_max_at = minimum_at, maximum_at
+        else:
+            lower = minimum < self._tail_min
+            higher = maximum > self._tail_max
+            self._tail_min = np.where(lower, minimum, self._tail_min)
+            self._tail_min_at = np.where(lower, minimum_at + self._tail_count, self._tail_min_at)
+            self._tail_max = np.where(higher, maximum, self._tail_max)
+            self._tail_max_at = np.where(higher, maximum_at + self._tail_count, self._tail_max_at)
+        self._tail_count += len(rows)
+
+    def _tail_pair(self):
+        """
+        Get the two points of the current bucket
+        :return: The first and the second point, arrays with one value per column
+        """
+        minimum_first = self._tail_min_at <= self._tail_max_at
+        return (np.where(minimum_first, self._tail_min, self._tail_max),
+                np.where(minimum_first, self._tail_max, self._tail_min))
+
+
+def store(size: int, simulation: dict = None) -> ColumnStore:
+    """
+    Create a store of the kind selected by mode, or by the "log_mode" of a scenario
+    :param size: Number of columns
+    :param simulation: The "simulation" block of a scenario, its log_mode, log_capacity and log_directory are used
+                       instead of the module settings
+    :return: The new store
+    """
+    kind, points, files = mode, capacity, directory
+    if simulation is not None:
+        kind = simulation.get("log_mode", "full")
+        points = simulation.get("log_capacity", 100000)
+        files = simulation.get("log_directory", "logs")
+    if kind == "full":
+        return ColumnStore(size)
+    if kind == "minmax":
+        return EnvelopeStore(size, points)
+    if kind == "disk":
+        return DiskStore(size, files)
+    print(f"! Unknown log mode {kind}!")
+    sys.exit(1)
+
+
+def column(simulation: dict = None) -> Column:
+    """
+    Create a standalone column (a store with a single column), samples can be added with Column.append
+    :param simulation: The "simulation" block of a scenario to take the kind of store from (see store)
+    :return: The new column
+    """
+    return store(1, simulation).columns[0]
@@ -0,0 +1,217 @@
+"""
+Runs parameter sweeps declared in scenarios.json on all cores, pygame is never imported.
+Usage: python -m sim.sweep [-s SCENARIO] (-d SECONDS | -n ITERATIONS) [-j WORKERS] [-c CHUNK] [-o DIRECTORY]
+
+A sweep is declared by adding a "sweep" block to a scenario. Parameters are paths inside its "setup" block, their
+values are either a list or a range ({"from": 1000, "to": 1300, "steps": 7}):
+    "sweep": {
+        "mode": "grid",
+        "parameters": {
+            "band.spring_constant": {"from": 1000, "to": 1300, "steps": 7},
+            "start.alpha": [1.57, 3.14]
+        }
+    }
+"grid" (default) simulates every combination of the values, "zip" pairs the n-th values of all parameters.
+Sweeps run on the vectorized ensemble engine, so the scenario has to use the euler integrator (the default).
+"""
+import argparse
+import csv
+import itertools
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from copy import deepcopy
+from datetime import datetime
+from os import path
+from time import perf_counter_ns
+from typing import Dict, List, Tuple, Union
+
+import numpy as np
+
+import sim
+from sim.ensemble import Ensemble
+
+# Summary columns: name, quantity of the ensemble and how the recorded values are reduced
+SUMMARY = (
+    ("length min [m]", "length", "min"),
+    ("length max [m]", "length", "max"),
+    ("length final [m]", "length", "final"),
+    ("ball velocity max |v| [m/s]", "velocity", "abs"),
+    ("angle min [rad]", "theta", "min"),
+    ("angle max [rad]", "theta", "max"),
+    ("angle final [rad]", "theta", "final"),
+    ("angular velocity max |w| [rad/s]", "angular_velocity", "abs"),
+)
+
+
+def _values(parameter: str, spec: Union[list, dict]) -> List[float]:
+    """
+    Get all values of a swept parameter
+    :param parameter: Name of the parameter (for error messages)
+    :param spec: A list of values or a range ({"from": .., "to": .., "steps": ..})
+    :return: The values
+    """
+    if isinstance(spec, list):
+        return spec
+    if isinstance(spec, dict) and {"from", "to", "steps"} <= spec.keys():
+        if spec["steps"] < 2:
+            return [spec["from"]]
+        step = (spec["to"] - spec["from"]) / (spec["steps"] - 1)
+        return [spec["from"] + step * index for index in range(spec["steps"])]
+    print(f"! Invalid values for swept parameter {parameter}!")
+    sys.exit(1)
+
+
+def expand(scenario: dict) -> Tuple[List[str], List[Tuple[float, ...]], List[dict]]:
+    """
+    Expand the sweep of a scenario into concrete scenarios
+    :param scenario: The scenario with a "sweep" block
+    :return: The swept parameters, the values of every point and a concrete scenario for every point
+    """
+    if "sweep" not in scenario:
+        print("! Scenario has no sweep defined!")
+        sys.exit(1)
+    if scenario["simulation"].get("integrator", "euler") != "euler":
+        print("! Sweeps run on the ensemble engine, which only supports the euler integrator!")
+        sys.exit(1)
+    sweep = scenario["sweep"]
+    parameters = list(sweep["parameters"].keys())
+    axes = [_values(parameter, sweep["parameters"][parameter]) for parameter in parameters]
+    for parameter in parameters:
+        group, _, key = parameter.partition(".")
+        if group not in scenario["setup"] or key not in scenario["setup"][group]:
+            print(f"! Swept parameter {parameter} does not exist in the setup!")
+            sys.exit(1)
+
+    mode = sweep.get("mode", "grid")
+    if mode == "grid":
+        points = list(itertools.product(*axes))
+    elif mode == "zip":
+        if len({len(axis) for axis in axes}) > 1:
+            print("! All parameters of a zip sweep need the same number of values!")
+            sys.exit(1)
+        points = list(zip(*axes))
+    else:
+        print(f"! Unknown sweep mode {mode}!")
+        sys.exit(1)
+
+    concrete = []
+    base = {key: value for key, value in scenario.items() if key != "sweep"}
+    for point in points:
+        new = deepcopy(base)
+        for parameter, value in zip(parameters, point):
+            group, _, key = parameter.partition(".")
+            new["setup"][group][key] = value
+        concrete.append(new)
+    return parameters, points, concrete
+
+
+def simulate(scenarios: List[dict], iterations: int) -> List[Dict[str, float]]:
+    """
+    Simulate scenarios as one ensemble and summarize them (runs in a worker process)
+    :param scenarios: The scenarios, all with the same delta_t and log_every
+    :param iterations: Number of iterations to simulate
+    :return: The summary (see SUMMARY) of every scenario
+    """
+    delta_t = scenarios[0]["simulation"]["delta_t"]
+    log_every = scenarios[0]["simulation"]["log_every"]
+    ensemble = Ensemble.from_scenarios(scenarios)
+    quantities = {quantity for _, quantity, _ in SUMMARY}
+    # Only logged states count (like in the csv of sim.headless), the initial state is not logged
+    minimum = {quantity: np.full(len(scenarios), np.inf) for quantity in quantities}
+    maximum = {quantity: np.full(len(scenarios), -np.inf) for quantity in quantities}
+
+    tick = ensemble.physics_tick
+    for iteration in range(iterations):
+        tick(delta_t)
+        if iteration % log_every == 0:
+            for quantity in quantities:
+                np.minimum(minimum[quantity], getattr(ensemble, quantity), out=minimum[quantity])
+                np.maximum(maximum[quantity], getattr(ensemble, quantity), out=maximum[quantity])
+
+    reduced = {}
+    for name, quantity, reduction in SUMMARY:
+        if reduction == "min":
+            reduced[name] = minimum[quantity]
+        elif reduction == "max":
+            reduced[name] = maximum[quantity]
+        elif reduction == "abs":
+            reduced[name] = np.maximum(np.abs(minimum[quantity]), np.abs(maximum[quantity]))
+        else:
+            reduced[name] = getattr(ensemble, quantity)
+    return [{name: float(values[index]) for name, values in reduced.items()} for index in range(len(scenarios))]
+
+
+def run(scenario: dict, iterations: int, workers: int = None, chunk: int = None) -> Tuple[List[str], List[list]]:
+    """
+    Run the sweep of a scenario on a process pool
+    :param scenario: The scenario with a "sweep" block
+    :param iterations: Number of iterations to simulate every point for
+    :param workers: Number of worker processes (default: number of cores)
+    :param chunk: Number of points simulated together in one ensemble (default: split evenly across workers)
+    :return: The header and the rows of the summary table
+    """
+    parameters, points, concrete = expand(scenario)
+    workers = workers or os.cpu_count() or 1
+    chunk = chunk or max(1, -(-len(points) // workers))
+    print(f"O Simulating {len(points)} points on {workers} workers", end="")
+    start = perf_counter_ns()
+    summaries: List[Dict[str, float]] = [{}] * len(points)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(simulate, concrete[first:first + chunk], iterations): first
+                   for first in range(0, len(points), chunk)}
+        done = 0
+        for future in as_completed(futures):
+            first = futures[future]
+            result = future.result()
+            summaries[first:first + len(result)] = result
+            done += len(result)
+            print(f"\r\033[K\rO Simulating {len(points)} points on {workers} workers ({done}/{len(points)})", end="")
+    took = (perf_counter_ns() - start) / 1e9
+    print(f"\r\033[K\rOK Simulated {len(points)} points in {round(took, 3)}s")
+
+    header = parameters + [name for name, _, _ in SUMMARY]
+    rows = [list(point) + [summary[name] for name, _, _ in SUMMARY] for point, summary in zip(points, summaries)]
+    return header, rows
+
+
+def main(argv: List[str] = None):
+    """
+    Parse the command line and run the requested sweep
+    :param argv: Command line arguments, defaults to sys.argv
+    :return:
+    """
+    parser = argparse.ArgumentParser(prog="python -m sim.sweep",
+                                     description="Run a parameter sweep declared in scenarios.json on all cores")
+    parser.add_argument("-s", "--scenario", type=int, help="Scenario with the sweep (default: the selected scenario)")
+    length = parser.add_mutually_exclusive_group(required=True)
+    length.add_argument("-d", "--duration", type=float, help="Simulated time [s]")
+    length.add_argument("-n", "--iterations", type=int, help="Number of iterations")
+    parser.add_argument("-j", "--workers", type=int, help="Number of worker processes (default: number of cores)")
+    parser.add_argument("-c", "--chunk", type=int, help="Number of points simulated together in one process")
+    parser.add_argument("-o", "--output", default="exports", help="Directory to save the table to (default: exports)")
+    args = parser.parse_args(argv)
+
+    scenarios = sim.scenarios.scenarios.json["scenarios"]
+    index = args.scenario if args.scenario is not None else sim.scenarios.selected()
+    if not 0 <= index < len(scenarios):
+        print(f"! Scenario {index} not defined!")
+        sys.exit(1)
+    scenario = scenarios[index]
+    if args.iterations is not None:
+        iterations = args.iterations
+    else:
+        iterations = int(round(args.duration / scenario["simulation"]["delta_t"]))
+
+    header, rows = run(scenario, iterations, args.workers, args.chunk)
+    file = path.join(args.output, f"ballz_sweep_{index}_{int(round(datetime.now().timestamp()))}.csv")
+    os.makedirs(args.output, exist_ok=True)
+    with open(file, "w", newline="", encoding="utf-8") as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(header)
+        writer.writerows(rows)
+    print("OK Saved " + file)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""
+Named timers of the hot paths. Every timer aggregates its durations into a histogram of fixed size, so measuring never
+needs more memory the longer the simulation runs.
+
+Buckets are logarithmic: durations below 16ns have a bucket each, above that every power of two is split into 8
+buckets, so a percentile is never off by more than 12.5%. Durations of 2^40ns (about 18 minutes) or more share the
+last bucket.
+
+The phases of the start are only measured once, they are kept as plain durations (see phase).
+"""
+import json
+import os
+from contextlib import contextmanager
+from datetime import datetime
+from os import path
+from time import perf_counter_ns
+from typing import Dict, Iterator, List
+
+import sim
+
+SUB_BITS = 3  # Every power of two is split into 2^SUB_BITS buckets
+LIMIT_BITS = 40  # Durations of 2^LIMIT_BITS ns or more share the last bucket
+BUCKETS = (LIMIT_BITS - SUB_BITS + 1) << SUB_BITS  # Number of buckets of every histogram
+
+directory = "exports"  # Directory to dump the timers to when ballz exits
+overlay = False  # Draw the timers onto the window (T to toggle)
+
+
+class Histogram:
+    """
+    Durations in nanoseconds, counted in logarithmic buckets (see module documentation)
+    """
+    counts: List[int]
+    count: int
+    total: int
+    maximum: int
+
+    def __init__(self):
+        """
+        Create a new empty histogram
+        """
+        self.counts = [0] * BUCKETS
+        self.count = 0
+        self.total = 0
+        self.maximum = 0
+
+    def add(self, duration: int):
+        """
+        Count a duration
+        :param duration: [ns] The duration
+        :return:
+        """
+        shift = duration.bit_length() - SUB_BITS - 1
+        if shift <= 0:
+            self.counts[duration] += 1
+        elif shift <= LIMIT_BITS - SUB_BITS - 1:
+            self.counts[(shift << SUB_BITS) + (duration >> shift)] += 1
+        else:
+            self.counts[-1] += 1
+        self.count += 1
+        self.total += duration
+        if duration > self.maximum:
+            self.maximum = duration
+
+    def percentile(self, fraction: float) -> int:
+        """
+        Estimate a percentile
+        :param fraction: The percentile (0 - 1), 0.5 is the median
+        :return: [ns] Upper bound of the bucket the percentile falls into, never more than the maximum
+        """
+        if not self.count:
+            return 0
+        remaining = fraction * self.count
+        for bucket, count in enumerate(self.counts):
+            remaining -= count
+            if remaining <= 0 and count:
+                return min(upper_bound(bucket), self.maximum)
+        return self.maximum
+
+    @property
+    def mean(self) -> float:
+        """
+        Mean of all durations
+        :return: [ns] The mean
+        """
+        return self.total / self.count if self.count else 0
+
+    def clear(self):
+        """
+        Forget all durations
+        :return:
+        """
+        self.counts = [0] * BUCKETS
+        self.count = 0
+        self.total = 0
+        self.maximum = 0
+
+    def summary(self) -> Dict[str, float]:
+        """
+        Describe the histogram
+        :return: count, mean, p50, p99, max and the non empty buckets (upper bound: count)
+        """
+        return {"count": self.count, "mean": self.mean, "p50": self.percentile(0.5), "p99": self.percentile(0.99),
+                "max": self.maximum,
+                "buckets": {upper_bound(bucket): count for bucket, count in enumerate(self.counts) if count}}
+
+
+def upper_bound(bucket: int) -> int:
+    """
+    Calculate the longest duration that is counted in a bucket
+    :param bucket: Index of the bucket
+    :return: [ns] The duration
+    """
+    if bucket < 1 << (SUB_BITS + 1):
+        return bucket
+    shift = (bucket >> SUB_BITS) - 1
+    return ((bucket - (shift << SUB_BITS) + 1) << shift) - 1
+
+
+timers: Dict[str, Histogram] = {}  # Every timer by name, in the order they were created
+startup: Dict[str, int] = {}  # [ns] Duration of every phase of the start, in the order they ran
+
+
+def timer(name: str) -> Histogram:
+    """
+    Get a timer, it is created when it is used for the first time
+    :param name: Name of the timer
+    :return: The histogram of the timer
+    """
+    if name not in timers:
+        timers[name] = Histogram()
+    return timers[name]
+
+
+@contextmanager
+def phase(name: str) -> Iterator[None]:
+    """
+    Measure a phase of the start
+    :param name: Name of the phase
+    :return:
+    """
+    start = perf_counter_ns()
+    yield
+    startup[name] = perf_counter_ns() - start
+
+
+def clear():
+    """
+    Forget the durations of all timers
+    :return:
+    """
+    for histogram in timers.values():
+        histogram.clear()
+
+
+def toggle_overlay():
+    """
+    Show or hide the timers in the window
+    :return:
+    """
+    global overlay  # skipcq: PYL-W0603 - the overlay is shown until it is toggled again
+    overlay = not overlay
+
+
+def format_duration(duration: float) -> str:
+    """
+    Format a duration for the overlay
+    :param duration: [ns] The duration
+    :return: The duration with a fitting unit
+    """
+    for unit, factor in (("s", 1e9), ("ms", 1e6), ("µs", 1e3)):
+        if duration >= factor:
+            return f"{duration / factor:.3g}{unit}"
+    return f"{duration:.0f}ns"
+
+
+def lines() -> List[str]:
+    """
+    Describe every timer that measured something
+    :return: One line of text per timer
+    """
+    return [f"{name}: p50 {format_duration(histogram.percentile(0.5))} | "
+            f"p99 {format_duration(histogram.percentile(0.99))} | max {format_duration(histogram.maximum)} | "
+            f"n {histogram.count}"
+            for name, histogram in timers.items() if histogram.count]
+
+
+def dump() -> str:
+    """
+    Save all timers to exports/ballz_timers.json (replaced every time)
+    :return: Path of the file
+    """
+    os.makedirs(directory, exist_ok=True)
+    file = path.join(directory, "ballz_timers.json")
+    with open(file, "w", encoding="utf-8") as output:
+        json.dump({"version": sim.VERSION, "date": datetime.now().isoformat(timespec="seconds"),
+                   "unit": "ns", "startup": startup,
+                   "timers": {name: histogram.summary() for name, histogram in timers.items()}},
+                  output, indent=2)
+    return file
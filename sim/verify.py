@@ -0,0 +1,252 @@
+"""
+Checks that the fast paths still compute exactly what the reference code computes, pygame is never imported:
+    the generated step kernels (ElasticBand.advance) against ElasticBand.physics_tick, for every integrator
+    the ensemble engine against ElasticBand.physics_tick of every band
+    ColumnStore and DiskStore against the rows appended to them, EnvelopeStore against the minimum and maximum of
+    every bucket
+Results have to be bitwise equal. Run it after changing sim.kernels, sim.ensemble, sim.storage or the equations of
+motion; it exits with 1 if a check failed.
+Usage: python -m sim.verify [-s SCENARIO] [-n ITERATIONS]
+"""
+import argparse
+import sys
+import tempfile
+from copy import deepcopy
+from typing import List
+
+import numpy as np
+
+import sim
+from sim import storage
+from sim.ensemble import Ensemble, QUANTITIES
+from sim.scene_objects import Scene, Coordinate
+
+
+def _fail(message: str):
+    """
+    Report a failed check on its own line
+    :param message: What differs
+    :return:
+    """
+    print("\r\033[K\r! " + message)
+
+
+def _variants(scenario: dict, count: int) -> List[dict]:
+    """
+    Create scenarios with different constants
+    :param scenario: The scenario to start from
+    :param count: Number of scenarios
+    :return: The scenarios, the first one is the scenario itself
+    """
+    generator = np.random.default_rng(1)
+    variants = []
+    for index in range(count):
+        variant = deepcopy(scenario)
+        if index:
+            variant["setup"]["band"]["spring_constant"] *= generator.uniform(0.5, 2)
+            for constant in ("mass", "friction_constant", "torsion_constant", "roll_friction_constant"):
+                variant["setup"]["balls"][constant] *= generator.uniform(0.5, 2)
+        variants.append(variant)
+    return variants
+
+
+def _band(scenario: dict) -> sim.objects.ElasticBand:
+    """
+    Create the band of a scenario on a scene that is never drawn
+    :param scenario: The scenario
+    :return: The band
+    """
+    return sim.scenarios.create_band(Scene(None, Coordinate(0, 0), 0, 0), scenario, Coordinate(0, 0))
+
+
+def kernels(scenario: dict, iterations: int) -> bool:
+    """
+    Advance bands in batches of different sizes and compare them with a band that takes every tick on its own
+    :param scenario: The scenario to simulate
+    :param iterations: Number of iterations
+    :return: Whether all states are equal
+    """
+    generator = np.random.default_rng(2)
+    passed = True
+    for integrator in ("euler", "rk4", "verlet", "dopri5"):
+        for variant in _variants(scenario, 3):
+            variant["simulation"]["integrator"] = integrator
+            delta_t = variant["simulation"]["delta_t"]
+            reference = _band(variant)
+            for _ in range(iterations):
+                reference.physics_tick(delta_t)
+            band = _band(variant)
+            done = 0
+            while done < iterations:
+                steps = min(int(generator.integers(0, 3000)), iterations - done)
+                band.advance(steps)
+                done += steps
+            if band.state() != reference.state():
+                _fail(f"The kernel of {integrator} differs from physics_tick: {band.state()} != "
+                      f"{reference.state()}")
+                passed = False
+    return passed
+
+
+def ensemble(scenario: dict, iterations: int) -> bool:
+    """
+    Simulate bands as one ensemble and compare every logged state with bands that are simulated one by one
+    :param scenario: The scenario to simulate (with the euler integrator)
+    :param iterations: Number of iterations
+    :return: Whether all states are equal
+    """
+    variants = _variants(scenario, 5)
+    for variant in variants:
+        variant["simulation"].pop("integrator", None)
+    delta_t = scenario["simulation"]["delta_t"]
+    log_every = 7
+    _, history = Ensemble.from_scenarios(variants).simulate(delta_t, iterations, log_every)
+    passed = True
+    for index, variant in enumerate(variants):
+        band = _band(variant)
+        states = []
+        for iteration in range(iterations):
+            band.physics_tick(delta_t)
+            if iteration % log_every == 0:
+                states.append(band.state())
+        expected = np.array(states)
+        differs = [quantity for column, quantity in enumerate(QUANTITIES)
+                   if not np.array_equal(history[quantity][:, index], expected[:, column])]
+        if differs:
+            _fail(f"The ensemble differs from physics_tick in {', '.join(differs)} of band {index}")
+            passed = False
+    return passed
+
+
+def _fill(store: storage.ColumnStore, rows: np.ndarray):
+    """
+    Append rows to a store, one by one and in blocks
+    :param store: The store
+    :param rows: Array of shape (rows, columns)
+    :return:
+    """
+    generator = np.random.default_rng(3)
+    index = 0
+    while index < len(rows):
+        count = int(generator.integers(1, 2 * storage.block_size))
+        if generator.integers(2):
+            store.extend(rows[index:index + count])
+        else:
+            for row in rows[index:index + count].tolist():
+                store.append_row(*row)
+        index += count
+
+
+def _rows(count: int, columns: int) -> np.ndarray:
+    """
+    Create rows that oscillate like the logged data of a band
+    :param count: Number of rows
+    :param columns: Number of columns
+    :return: Array of shape (rows, columns)
+    """
+    generator = np.random.default_rng(4)
+    time = np.arange(count)[:, np.newaxis]
+    return np.sin(time * generator.uniform(0.001, 0.1, columns)) + generator.normal(0, 0.1, (count, columns))
+
+
+def _statistics(column: storage.Column, values: np.ndarray) -> bool:
+    """
+    Compare the statistics of a column with the samples that were added to it
+    :param column: The column
+    :param values: All samples
+    :return: Whether they are equal (the mean up to rounding)
+    """
+    statistics = column.statistics
+    return (statistics.count == len(values) and statistics.minimum == values.min()
+            and statistics.maximum == values.max() and np.isclose(statistics.mean, values.mean()))
+
+
+def stores(count: int) -> bool:
+    """
+    Fill every kind of store and compare the stored samples with the rows
+    :param count: Number of rows
+    :return: Whether all samples are as expected
+    """
+    rows = _rows(count, 3)
+    passed = True
+    with tempfile.TemporaryDirectory() as directory:
+        for name, store in (("ColumnStore", storage.ColumnStore(3)), ("DiskStore", storage.DiskStore(3, directory))):
+            for column in store.columns:
+                column.window(1000)  # Kept up to date from now on
+            _fill(store, rows[:count // 2])
+            snapshots = [column.snapshot() for column in store.columns]
+            store.truncate(count // 4)
+            _fill(store, rows[count // 4:])
+            for index, column in enumerate(store.columns):
+                window = column.window(1000)
+                if not np.array_equal(column.view(), rows[:, index]):
+                    _fail(f"{name} lost or changed samples")
+                    passed = False
+                if not np.array_equal(snapshots[index], rows[:count // 2, index]):
+                    _fail(f"A snapshot of {name} changed after truncating it")
+                    passed = False
+                if not _statistics(column, rows[:, index]):
+                    _fail(f"The statistics of {name} are wrong")
+                    passed = False
+                if (window.minimum, window.maximum) != (rows[-1000:, index].min(), rows[-1000:, index].max()):
+                    _fail(f"The window of {name} is wrong")
+                    passed = False
+            del snapshots, store  # The files of the disk store have to be closed before they are deleted
+
+    for points in (10, 1000):
+        store = storage.EnvelopeStore(3, points)
+        _fill(store, rows)
+        size = store.bucket_size
+        for index, column in enumerate(store.columns):
+            expected = []
+            for start in range(0, count, size):
+                bucket = rows[start:start + size, index]
+                first, second = sorted((bucket.argmin(), bucket.argmax()))  # In the order they occurred
+                expected += [bucket[first], bucket[second]]
+            if not np.array_equal(column.view(), expected):
+                _fail(f"EnvelopeStore ({points} points) does not hold the minimum and maximum of every bucket")
+                passed = False
+            if len(column) > points + 2:
+                _fail(f"EnvelopeStore ({points} points) holds {len(column)} points")
+                passed = False
+            if not _statistics(column, rows[:, index]):
+                _fail(f"The statistics of EnvelopeStore ({points} points) are wrong")
+                passed = False
+    return passed
+
+
+def main(argv: List[str] = None):
+    """
+    Run all checks
+    :param argv: Command line arguments, defaults to sys.argv
+    :return:
+    """
+    parser = argparse.ArgumentParser(prog="python -m sim.verify",
+                                     description="Check the kernels, the ensemble engine and the stores")
+    parser.add_argument("-s", "--scenario", type=int, help="Scenario to simulate (default: the selected scenario)")
+    parser.add_argument("-n", "--iterations", type=int, default=20000,
+                        help="Iterations every band is simulated for (default: 20000)")
+    args = parser.parse_args(argv)
+
+    scenarios = sim.scenarios.scenarios.json["scenarios"]
+    index = args.scenario if args.scenario is not None else sim.scenarios.selected()
+    if not 0 <= index < len(scenarios):
+        print(f"! Scenario {index} not defined!")
+        sys.exit(1)
+    scenario = scenarios[index]
+
+    passed = True
+    checks = (("kernels", lambda: kernels(scenario, args.iterations), "The kernels match physics_tick"),
+              ("ensemble", lambda: ensemble(scenario, args.iterations), "The ensemble matches physics_tick"),
+              ("stores", lambda: stores(100000), "The stores hold what was appended"))
+    for name, check, success in checks:
+        print(f"O Checking the {name}", end="")
+        if check():
+            print("\r\033[K\rOK " + success)
+        else:
+            passed = False
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -12,20 +12,29 @@ width: int
 height: int
 middle: Coordinate
 pygame_scene: pygame.display
+background: pygame.Surface  # Everything that never changes (see static_scene.init), drawn over old content
 
 
 def init():
     """
-    Initialize the pygame window
+    Initialize the pygame window. Only the display is initialized, ballz needs no other subsystem of pygame
     :return:
     """
-    pygame.init()
+    pygame.display.init()
     info = pygame.display.Info()
     pygame.display.set_caption(f"ballz v{sim.VERSION}", "ballz simulation")
     sim.window.width, sim.window.height = int(math.floor(info.current_w * 0.8)), int(math.floor(info.current_h * 0.8))
     sim.window.pygame_scene = pygame.display.set_mode((sim.window.width, sim.window.height))
-    pygame.display.set_icon(pygame.image.load("icon.png", "burning football"))
+    sim.window.background = pygame.Surface((sim.window.width, sim.window.height))
     scene_x = math.floor(sim.window.width * 0.8)
     sim.scene = sim.scene_objects.Scene(pygame_scene, Coordinate(0, 0), scene_x, sim.window.height)
     sim.data.corner = Coordinate(scene_x, 0)
     sim.window.middle = Coordinate(sim.window.width / 2, sim.window.height / 2)
+
+
+def icon():
+    """
+    Set the icon of the window, it is only loaded once the first frame is shown
+    :return:
+    """
+    pygame.display.set_icon(pygame.image.load("icon.png", "burning football"))
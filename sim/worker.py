@@ -0,0 +1,423 @@
+"""
+Runs the physics in a separate process, so rendering never stops the integration and a second core is used.
+Enable it with "physics_process": true in config.json.
+
+The physics process simulates the band of the current scenario and publishes every logged row and the current state
+into a ring buffer in shared memory, the window process only copies them into its own stores and draws. Control
+messages (load, restore, simulate, step, quit) are sent over a pipe and answered once they have been handled.
+"""
+import multiprocessing
+import sys
+from multiprocessing.connection import Connection
+from multiprocessing.shared_memory import SharedMemory
+from time import perf_counter_ns, sleep
+from typing import List, Tuple
+
+import numpy as np
+
+import sim
+from sim.scene_objects import Scene, Coordinate
+from utils import pool
+
+enabled = pool.open("config.json").json.get("physics_process", False)
+capacity = 65536  # Rows the ring buffer holds
+batch_time = 5000000  # [ns] Time a batch of iterations should take, messages are only handled between batches
+current: "PhysicsProcess" = None  # The running physics process
+
+ROW = 12  # The 10 values of ElasticBand.log, real time [s] and cpu time [ns]
+STATE = 7  # Real time, length, velocity, acceleration, angle, angular velocity and angular acceleration
+LOOP_STAGES = ("log", "timing", "realtime")  # Stages of sim.loop, Run does the same on its own
+
+
+class Ring:
+    """
+    A ring buffer of rows and a snapshot of the state in shared memory, written by one process and read by another
+    """
+    positions: np.ndarray  # Rows written, rows read, state sequence (odd while the state is written), iteration
+    state: np.ndarray  # See STATE
+    rows: np.ndarray
+
+    def __init__(self, buffer: memoryview, size: int):
+        """
+        Map a ring buffer onto shared memory
+        :param buffer: The shared memory, at least Ring.bytes(size) long
+        :param size: Number of rows the ring holds
+        """
+        self.positions = np.ndarray((4,), np.int64, buffer, 0)
+        self.state = np.ndarray((STATE,), np.float64, buffer, 4 * 8)
+        self.rows = np.ndarray((size, ROW), np.float64, buffer, (4 + STATE) * 8)
+
+    @staticmethod
+    def bytes(size: int) -> int:
+        """
+        Get the size of a ring buffer in shared memory
+        :param size: Number of rows the ring holds
+        :return: Size in bytes
+        """
+        return (4 + STATE + size * ROW) * 8
+
+    def write(self, rows: np.ndarray) -> int:
+        """
+        Add rows, as many as there is space for
+        :param rows: Array of shape (rows, ROW)
+        :return: Number of rows written
+        """
+        written, read = int(self.positions[0]), int(self.positions[1])
+        count = min(len(rows), len(self.rows) - (written - read))
+        start = written % len(self.rows)
+        first = min(count, len(self.rows) - start)
+        self.rows[start:start + first] = rows[:first]
+        self.rows[:count - first] = rows[first:count]
+        # Only publish the rows once they are complete
+        self.positions[0] = written + count
+        return count
+
+    def read(self) -> np.ndarray:
+        """
+        Take all rows that have not been read yet
+        :return: Array of shape (rows, ROW)
+        """
+        written, read = int(self.positions[0]), int(self.positions[1])
+        start, end = read % len(self.rows), written % len(self.rows)
+        if start < end or written == read:
+            rows = self.rows[start:end].copy()
+        else:
+            rows = np.concatenate((self.rows[start:], self.rows[:end]))
+        self.positions[1] = written
+        return rows
+
+    def publish(self, iteration: int, state: Tuple[float, ...]):
+        """
+        Replace the state snapshot
+        :param iteration: The current iteration
+        :param state: See STATE
+        :return:
+        """
+        self.positions[2] += 1
+        self.positions[3] = iteration
+        self.state[:] = state
+        self.positions[2] += 1
+
+    def snapshot(self) -> Tuple[int, List[float]]:
+        """
+        Read the state snapshot, retrying while it is being replaced
+        :return: The iteration and the state (see STATE)
+        """
+        while True:
+            sequence = int(self.positions[2])
+            iteration, state = int(self.positions[3]), self.state.tolist()
+            if sequence % 2 == 0 and sequence == self.positions[2]:
+                return iteration, state
+
+
+class Outbox:
+    """
+    Collects the rows ElasticBand.log writes (in place of its ColumnStore) until they are published
+    """
+    pending: List[tuple]
+
+    def __init__(self):
+        """
+        Create an empty outbox
+        """
+        self.pending = []
+
+    def append_row(self, *values: float):
+        """
+        Keep one row
+        :param values: One value per column
+        :return:
+        """
+        self.pending.append(values)
+
+
+class Run:
+    """
+    The simulation of a scenario inside the physics process, it works like the tick of sim.loop
+    """
+    band: sim.objects.ElasticBand
+    delta_t: float
+    log_every: int
+    log: bool  # Log data
+    measure: bool  # Measure the cpu time of every logged iteration
+    iteration: int
+    realtime: float
+    outbox: Outbox
+    times: List[Tuple[float, float]]  # Real time and cpu time of every logged row
+    backlog: np.ndarray  # Rows that did not fit into the ring buffer yet
+
+    def __init__(self, scenario: dict, center: Coordinate, log: bool, measure: bool):
+        """
+        Create the band of a scenario
+        :param scenario: The scenario (one entry of the "scenarios" list)
+        :param center: Center of rotation of the band (the logged coordinates depend on it)
+        :param log: Log data
+        :param measure: Measure the cpu time of every logged iteration
+        """
+        self.band = sim.scenarios.create_band(Scene(None, Coordinate(0, 0), 0, 0), scenario, center)
+        self.outbox = Outbox()
+        self.band.store = self.outbox
+        self.delta_t = scenario["simulation"]["delta_t"]
+        self.log_every = scenario["simulation"]["log_every"]
+        self.log = log
+        self.measure = measure
+        self.iteration = 0
+        self.realtime = 0.0
+        self.times = []
+        self.backlog = np.empty((0, ROW))
+
+    def run(self, iterations: int):
+        """
+        Simulate iterations
+        :param iterations: Number of iterations
+        :return:
+        """
+        band = self.band
+        advance = band.advance
+        delta_t = self.delta_t
+        log_every = self.log_every
+        end = self.iteration + iterations
+        while self.iteration < end:
+            if self.log and self.iteration % log_every == 0:
+                precalc = perf_counter_ns()
+                advance(1)
+                band.log()
+                self.realtime += delta_t
+                self.times.append((self.realtime, perf_counter_ns() - precalc if self.measure else 0))
+                self.iteration += 1
+                continue
+            # Advance up to the next logged iteration at once
+            steps = (min(end, -(-self.iteration // log_every) * log_every) if self.log else end) - self.iteration
+            advance(steps)
+            self.iteration += steps
+        # The window process updates the coordinates whenever the band is drawn, do the same once per batch
+        band._update_coords()  # skipcq: PYL-W0212 - the band is never drawn in this process
+
+    def publish(self, ring: Ring):
+        """
+        Write the logged rows and the current state into the ring buffer
+        :param ring: The ring buffer
+        :return:
+        """
+        if self.outbox.pending:
+            rows = np.hstack((np.array(self.outbox.pending, np.float64), np.array(self.times, np.float64)))
+            self.outbox.pending = []
+            self.times = []
+            self.backlog = np.concatenate((self.backlog, rows)) if len(self.backlog) else rows
+        if len(self.backlog):
+            self.backlog = self.backlog[ring.write(self.backlog):]
+        ring.publish(self.iteration, (self.realtime,) + self.band.state())
+
+    def restore(self, iteration: int, realtime: float, state: Tuple[float, ...]):
+        """
+        Continue from a checkpoint, rows that have not been published yet are dropped
+        :param iteration: Iteration of the checkpoint
+        :param realtime: Real time of the checkpoint
+        :param state: State of the band (see ElasticBand.state)
+        :return:
+        """
+        self.band.restore(state)
+        self.iteration = iteration
+        self.realtime = realtime
+        self.outbox.pending = []
+        self.times = []
+        self.backlog = np.empty((0, ROW))
+
+
+def work(connection: Connection, name: str, size: int):
+    """
+    Main function of the physics process
+    :param connection: Pipe to receive control messages from
+    :param name: Name of the shared memory holding the ring buffer
+    :param size: Number of rows the ring holds
+    :return:
+    """
+    memory = SharedMemory(name)
+    ring = Ring(memory.buf, size)
+    run: Run = None
+    simulate = False
+    batch = 1
+    while True:
+        if run is not None and len(run.backlog):
+            # Wait until the window process has read some rows
+            timeout = 0.001
+        else:
+            timeout = 0 if simulate else None
+        if connection.poll(timeout):
+            message = connection.recv()
+            if message[0] == "quit":
+                break
+            if message[0] == "load":
+                _, scenario, center, log, measure = message
+                run = Run(scenario, Coordinate(*center), log, measure)
+                simulate = False
+                run.publish(ring)
+                # Everything written so far belongs to the last scenario
+                connection.send(int(ring.positions[0]))
+            elif message[0] == "restore":
+                run.restore(*message[1:])
+                run.publish(ring)
+                connection.send(int(ring.positions[0]))
+            elif message[0] == "simulate":
+                simulate = message[1]
+                run.publish(ring)
+                connection.send(None)
+            elif message[0] == "step":
+                run.run(message[1])
+                run.publish(ring)
+                connection.send(None)
+            continue
+        if run is None:
+            sleep(0.001)
+            continue
+        if len(run.backlog):
+            run.publish(ring)
+            continue
+        start = perf_counter_ns()
+        run.run(batch)
+        run.publish(ring)
+        took = perf_counter_ns() - start
+        if took < batch_time // 2:
+            batch *= 2
+        elif took > batch_time * 2 and batch > 1:
+            batch //= 2
+    del ring
+    memory.close()
+
+
+class PhysicsProcess:
+    """
+    The window side of the physics process
+    """
+    band: sim.objects.ElasticBand = None  # The band in the window process that shows the simulated one
+    log: bool = True
+    measure: bool = True
+
+    def __init__(self, size: int):
+        """
+        Start the physics process
+        :param size: Number of rows the ring buffer holds
+        """
+        context = multiprocessing.get_context("spawn")  # Do not fork the window process
+        self.memory = SharedMemory(create=True, size=Ring.bytes(size))
+        self.ring = Ring(self.memory.buf, size)
+        self.ring.positions[:] = 0
+        self.connection, child = context.Pipe()
+        self.process = context.Process(target=work, args=(child, self.memory.name, size), name="physics",
+                                       daemon=True)
+        self.process.start()
+
+    def _request(self, *message):
+        """
+        Send a control message and wait until it has been handled
+        :param message: The message
+        :return: The answer
+        """
+        try:
+            self.connection.send(message)
+            return self.connection.recv()
+        except (EOFError, OSError):
+            print("! The physics process stopped!")
+            sys.exit(1)
+
+    def load(self, scenario: dict, band: sim.objects.ElasticBand, log: bool, measure: bool):
+        """
+        Start simulating a scenario (paused)
+        :param scenario: The scenario (one entry of the "scenarios" list)
+        :param band: The band showing the scenario in the window process
+        :param log: Log data
+        :param measure: Measure the cpu time of every logged iteration
+        :return:
+        """
+        ignored = [name for name in sim.pipeline.registered() if name not in LOOP_STAGES]
+        if ignored:
+            print("! The physics process ignores the pipeline stages " + ", ".join(ignored) +
+                  " (disable \"physics_process\" in config.json to use them)")
+        self.band = band
+        self.log = log
+        self.measure = measure
+        position = self._request("load", scenario, (band.center.x, band.center.y), log, measure)
+        # Skip the rows of the last scenario
+        self.ring.positions[1] = position
+
+    def restore(self, iteration: int, realtime: float, state: Tuple[float, ...]):
+        """
+        Continue from a checkpoint
+        :param iteration: Iteration of the checkpoint
+        :param realtime: Real time of the checkpoint
+        :param state: State of the band (see ElasticBand.state)
+        :return:
+        """
+        position = self._request("restore", iteration, realtime, state)
+        # Skip the rows simulated before
+        self.ring.positions[1] = position
+
+    def simulate(self, simulate: bool):
+        """
+        Start or stop simulating
+        :param simulate: Whether to simulate
+        :return:
+        """
+        self._request("simulate", simulate)
+        self.receive()
+
+    def step(self, iterations: int):
+        """
+        Simulate a number of iterations and wait for them
+        :param iterations: Number of iterations
+        :return:
+        """
+        self._request("step", iterations)
+        self.receive()
+
+    def receive(self):
+        """
+        Copy the new rows into the stores and the current state into the band
+        :return:
+        """
+        rows = self.ring.read()
+        if len(rows) and self.log:
+            self.band.store.extend(rows[:, :10])
+            sim.data.realtime.extend(rows[:, 10])
+            if self.measure:
+                sim.data.perf_time.extend(rows[:, 11])
+        sim.iteration, state = self.ring.snapshot()
+        band = self.band
+        (sim.loop.realtime, band.length, band.velocity_of_ball, band.acceleration_of_ball,
+         band.angle_theta, band.angular_velocity_theta, band.angular_acceleration_theta) = state
+
+    def stop(self):
+        """
+        Stop the physics process and free the shared memory
+        :return:
+        """
+        try:
+            self.connection.send(("quit",))
+        except (EOFError, OSError):
+            pass  # Already stopped
+        self.process.join()
+        del self.ring
+        self.memory.close()
+        self.memory.unlink()
+
+
+def start():
+    """
+    Start the physics process
+    :return:
+    """
+    global current  # skipcq: PYL-W0603 - there is only one physics process
+    print("O Starting physics process", end="")
+    current = PhysicsProcess(capacity)
+    print("\r\033[K\rOK Started physics process")
+
+
+def stop():
+    """
+    Stop the physics process if it is running
+    :return:
+    """
+    global current  # skipcq: PYL-W0603 - there is only one physics process
+    if current is not None:
+        current.stop()
+        current = None
@@ -2,14 +2,19 @@
 A set of utilities for maintaining git repositories
 """
 from subprocess import run, PIPE
+from threading import Event, Thread
 
+available = Event()  # Set when the background check found a new version
 
-def fetch() -> bool:
+
+def fetch(quiet: bool = False) -> bool:
     """
     Fetch updates
+    :param quiet: Only print errors
     :return: Whether a new version is available
     """
-    print("\r\033[K\rO Fetching updates...", end="")
+    if not quiet:
+        print("\r\033[K\rO Fetching updates...", end="")
     fetch_process = run("git fetch origin", shell=True, stdout=PIPE, stderr=PIPE)
     if fetch_process.returncode != 0:
         print(f"\r\033[K\r! Error: Could not fetch git updates ({fetch_process.returncode})")
@@ -54,3 +59,32 @@ def update() -> bool:
         return True
     print("\r\033[K\rOK No updates found!")
     return False
+
+
+def behind() -> bool:
+    """
+    Check whether the fetched main branch has commits that are not pulled yet
+    :return: Whether a new version is available
+    """
+    count_process = run("git rev-list --count HEAD..origin/main", shell=True, stdout=PIPE, stderr=PIPE)
+    return count_process.returncode == 0 and count_process.stdout.decode('utf-8').strip() not in ("", "0")
+
+
+def check_in_background() -> Thread:
+    """
+    Fetch updates without waiting for git, available is set if there is a new version. Pull it with pull()
+    :return: The thread checking for updates
+    """
+    def check():
+        """
+        Fetch updates and tell whether there is a new version, also one that was fetched but not pulled before
+        :return:
+        """
+        fetch(quiet=True)
+        if behind():
+            available.set()
+            print("\r\033[K\rOK A new version is available, press U in the window to update and restart")
+
+    thread = Thread(target=check, name="update check", daemon=True)
+    thread.start()
+    return thread